@@ -0,0 +1,408 @@
+# Append-only log with group commit for rows ingested through /update_csv/
+# -------------------------------
+# Rows are not written straight into the csv anymore. They are buffered, and a background
+# writer thread commits them to a log segment next to the csv in groups: every `flush_rows`
+# rows or every `flush_ms` milliseconds, whatever comes first. A caller only gets its row
+# acknowledged once the group holding it has been written (and fsynced, depending on policy).
+# A second background thread compacts finished segments into the main csv.
+#
+# Files next to the csv (e.g. ./dataset_file.csv):
+#   ./dataset_file.csv.log.00000001   log segments, one "#batch <nbytes>" header + csv lines per group
+#   ./dataset_file.csv.compacting     marker written while a segment is being merged into the csv
+#   ./dataset_file.csv.lock           held (flock) by the live AppendLog of the csv, where the OS supports it
+#
+# Leftovers of a crash (segments that were never merged, a marker of a half-done merge) are replayed by recover(),
+# which readers run before they first parse the csv, and by every new AppendLog. A live AppendLog in another
+# process holds the lock file, so recover() leaves its segments alone.
+#
+# fsync policies:
+#   "always"   - fsync before acknowledging a group. Acknowledged rows survive an OS crash or power loss.
+#                The directory is fsynced too whenever a segment or the marker is created, replaced or removed,
+#                so a power loss can neither lose a committed segment nor bring back one that was already merged.
+#   "interval" - fsync at most every `fsync_ms`. Acknowledged rows survive a process crash.
+#   "never"    - leave it to the OS.
+#
+# Every compaction records the csv's stat stamp before and after it (take_merges()), so a reader that keeps the
+# csv parsed in memory can tell our own appends apart from someone else rewriting the file.
+
+import glob
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+try:
+    import fcntl
+except ImportError: # Windows: no advisory locks, keeping one writing process per csv is up to the deployment
+    fcntl = None
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+class AppendLog:
+
+    def __init__(self, csv_path, flush_rows=256, flush_ms=5, fsync="always", fsync_ms=1000, compact_ms=1000):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+
+        self.csv_path    = csv_path
+        self.flush_rows  = flush_rows
+        self.flush_ms    = flush_ms
+        self.fsync       = fsync
+        self.fsync_ms    = fsync_ms
+        self.compact_ms  = compact_ms
+
+        self._cond         = threading.Condition()   # guards the buffer below
+        self._buffer       = []                      # (payload bytes, row count, future)
+        self._buffered     = 0
+        self._first_at     = None
+        self._flush_now    = False
+        self._closing      = False
+        self._io_lock      = threading.Lock()        # guards the open segment
+        self._compact_lock = threading.Lock()
+        self._merges       = []                      # (csv stamp before, csv stamp after) of every compaction
+        self._last_fsync   = time.monotonic()
+        self._stop         = threading.Event()
+
+        self._owner = lock_owner(csv_path)
+        if self._owner is None:
+            raise RuntimeError(f"{csv_path} is already being appended to by another process")
+        replay_leftovers(csv_path, fsync)
+        self._segment_seq = max(self._segment_numbers(), default=0) + 1
+        self._segment = self._open_segment(self._segment_seq)
+
+        self._writer = threading.Thread(target=self._write_loop, name="append-log-writer", daemon=True)
+        self._compactor = threading.Thread(target=self._compact_loop, name="append-log-compactor", daemon=True)
+        self._writer.start()
+        self._compactor.start()
+
+
+    # Public API___________________________
+    def append(self, rows):
+        """Queue a DataFrame of rows. Returns a Future that resolves once the rows are committed."""
+        payload = rows.to_csv(header=False, index=False, lineterminator="\n").encode("utf-8")
+        future = Future()
+        with self._cond:
+            if self._closing:
+                raise RuntimeError(f"Append log for {self.csv_path} is closed")
+            if not self._buffer:
+                self._first_at = time.monotonic()
+            self._buffer.append((payload, len(rows), future))
+            self._buffered += len(rows)
+            self._cond.notify_all()
+        return future
+
+    def flush(self):
+        """Commit whatever is buffered right now and wait for it."""
+        with self._cond:
+            pending = [future for _, _, future in self._buffer]
+            self._flush_now = True
+            self._cond.notify_all()
+        for future in pending:
+            future.result()
+
+    def compact(self):
+        """Merge every committed segment into the main csv."""
+        with self._compact_lock:
+            with self._io_lock:
+                if not self._segment.closed and self._segment.tell() > 0: # seal the current segment and start a new one
+                    self._segment.close()
+                    self._segment_seq += 1
+                    self._segment = self._open_segment(self._segment_seq)
+            sealed = [number for number in self._segment_numbers() if number != self._segment_seq]
+            if not sealed:
+                return
+            before = file_stamp(self.csv_path)
+            for number in sealed:
+                self._merge_segment(self._segment_path(number))
+            self._merges.append((before, file_stamp(self.csv_path)))
+
+    def take_merges(self):
+        """(stamp before, stamp after) of every compaction since the last call, oldest first."""
+        with self._compact_lock:
+            merges, self._merges = self._merges, []
+        return merges
+
+    def close(self):
+        with self._cond:
+            if self._closing:
+                return
+            self._closing = True
+            self._cond.notify_all()
+        self._writer.join()
+        self._stop.set()
+        self._compactor.join()
+        self.compact()
+        with self._io_lock:
+            self._segment.close()
+            if os.path.exists(self._segment_path(self._segment_seq)): # always empty after the last compact
+                os.remove(self._segment_path(self._segment_seq))
+                self._fsync_dir()
+        self._owner.close() # releases the lock
+    #___________________________
+
+
+    # Group commit___________________________
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closing:
+                    self._cond.wait()
+                if not self._buffer: # closing and nothing left to write
+                    return
+
+                deadline = self._first_at + self.flush_ms / 1000
+                while self._buffered < self.flush_rows and not self._flush_now and not self._closing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch, self._buffer = self._buffer, []
+                self._buffered = 0
+                self._flush_now = False
+
+            self._commit(batch)
+
+    def _commit(self, batch):
+        payload = b"".join(rows for rows, _, _ in batch)
+        try:
+            with self._io_lock:
+                if self._segment.closed: # sealing after an earlier failure could not open the next segment
+                    self._segment = self._open_segment(self._segment_seq)
+                start = self._segment.tell()
+                try:
+                    write_all(self._segment, f"#batch {len(payload)}\n".encode("ascii") + payload)
+                    now = time.monotonic()
+                    if self.fsync == "always" or (self.fsync == "interval" and now - self._last_fsync >= self.fsync_ms / 1000):
+                        os.fsync(self._segment.fileno())
+                        self._last_fsync = now
+                except Exception:
+                    self._seal_failed(start)
+                    raise
+        except Exception as e:
+            print(f"Append log commit failed for {self.csv_path}: {e}")
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        for _, _, future in batch:
+            future.set_result(None)
+
+    def _seal_failed(self, start):
+        # A failed write (e.g. ENOSPC) can leave part of a batch behind, and read_batches stops at the first torn
+        # record. Cut it off and move on to a new segment, so batches acknowledged after this one are not lost
+        path = self._segment_path(self._segment_seq)
+        self._segment.close()
+        try:
+            os.truncate(path, start)
+        except OSError as e:
+            print(f"Could not cut the failed batch off {path}: {e}. It is the last record of a sealed segment now")
+        self._segment_seq += 1
+        self._segment = self._open_segment(self._segment_seq)
+    #___________________________
+
+
+    # Compaction and recovery___________________________
+    def _compact_loop(self):
+        while not self._stop.wait(self.compact_ms / 1000):
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"Append log compaction failed for {self.csv_path}: {e}")
+
+    def _merge_segment(self, segment_path):
+        merge_segment(self.csv_path, segment_path, self.fsync)
+
+    def _segment_numbers(self):
+        return segment_numbers(self.csv_path)
+
+    def _open_segment(self, number):
+        segment = open(self._segment_path(number), "ab", buffering=0) # unbuffered, so a failed write leaves nothing pending
+        self._fsync_dir() # the new file's directory entry has to be durable before we ack rows written to it
+        return segment
+
+    def _fsync_dir(self):
+        if self.fsync != "never":
+            fsync_dir(self.csv_path)
+
+    def _segment_path(self, number):
+        return segment_path(self.csv_path, number)
+    #___________________________
+
+
+# Files of a log, usable without a live AppendLog___________________________
+def recover(csv_path, fsync="always"):
+    """Replay what a crashed AppendLog left next to `csv_path`. Returns False if a live AppendLog owns the csv."""
+    if not has_leftovers(csv_path):
+        return True
+    owner = lock_owner(csv_path)
+    if owner is None:
+        return False
+    try:
+        replay_leftovers(csv_path, fsync)
+    finally:
+        owner.close()
+    return True
+
+def discard_leftovers(csv_path, fsync="always"):
+    """Drop unmerged segments and the marker of a csv that is about to be replaced. Returns False if a live AppendLog owns the csv."""
+    if not has_leftovers(csv_path):
+        return True
+    owner = lock_owner(csv_path)
+    if owner is None:
+        return False
+    try:
+        for number in segment_numbers(csv_path):
+            print(f"Discarding {segment_path(csv_path, number)}, the csv it belongs to is being replaced")
+            os.remove(segment_path(csv_path, number))
+        if os.path.exists(marker_path(csv_path)):
+            os.remove(marker_path(csv_path))
+        if fsync != "never":
+            fsync_dir(csv_path)
+    finally:
+        owner.close()
+    return True
+
+def replay_leftovers(csv_path, fsync):
+    # Caller holds the lock
+    marker = marker_path(csv_path)
+    if os.path.exists(marker):
+        with open(marker, "rb") as f:
+            info = json.loads(f.read())
+        segment = info["segment"]
+        stat = os.stat(csv_path) if os.path.exists(csv_path) else None
+        if not os.path.exists(segment):
+            pass # merge finished, only the marker removal was lost
+        elif stat is None or info.get("inode", stat.st_ino) != stat.st_ino: # markers from before the inode was recorded are trusted
+            print(f"Discarding {segment}, the csv it was being merged into has been replaced since")
+            os.remove(segment)
+        elif info["base_size"] <= stat.st_size:
+            print(f"Recovering interrupted compaction of {segment}")
+            with open(csv_path, "r+b") as f:
+                f.truncate(info["base_size"])
+                os.fsync(f.fileno())
+        else:
+            print(f"{csv_path} is shorter than before the interrupted compaction of {segment}, merging the segment again without truncating")
+        os.remove(marker)
+        if fsync != "never":
+            fsync_dir(csv_path)
+
+    for number in segment_numbers(csv_path): # anything left over from last run goes into the csv now
+        merge_segment(csv_path, segment_path(csv_path, number), fsync)
+
+def merge_segment(csv_path, segment, fsync):
+    payload = b"".join(read_batches(segment))
+    if payload:
+        base_size = os.path.getsize(csv_path) if os.path.exists(csv_path) else 0
+        inode = os.stat(csv_path).st_ino if os.path.exists(csv_path) else None
+
+        # If we crash half way through the append, recovery cuts the csv back to base_size and redoes it,
+        # as long as the csv is still the same file (inode) by then
+        write_atomic(marker_path(csv_path), json.dumps({"segment": segment, "base_size": base_size, "inode": inode}).encode("utf-8"))
+
+        with open(csv_path, "ab+") as f:
+            if base_size > 0:
+                f.seek(base_size - 1)
+                if f.read(1) != b"\n": # uploaded csvs do not always end with a newline
+                    payload = b"\n" + payload
+            f.write(payload)
+            f.flush()
+            if fsync != "never":
+                os.fsync(f.fileno())
+
+    # Segment first, then marker, each removal durable before the next: a marker without its segment is a no-op on recovery
+    os.remove(segment)
+    if fsync != "never":
+        fsync_dir(csv_path)
+    if os.path.exists(marker_path(csv_path)):
+        os.remove(marker_path(csv_path))
+        if fsync != "never":
+            fsync_dir(csv_path)
+
+def has_leftovers(csv_path):
+    return os.path.exists(marker_path(csv_path)) or bool(segment_numbers(csv_path))
+
+def lock_owner(csv_path):
+    """Open <csv>.lock and take it. Returns the open file (closing it releases the lock), or None if someone else holds it."""
+    owner = open(f"{csv_path}.lock", "a+b")
+    if fcntl is not None:
+        try:
+            fcntl.flock(owner.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            owner.close()
+            return None
+    return owner
+
+def segment_numbers(csv_path):
+    numbers = []
+    for path in glob.glob(glob.escape(csv_path) + ".log.*"):
+        suffix = path.rsplit(".", 1)[-1]
+        if suffix.isdigit():
+            numbers.append(int(suffix))
+    return sorted(numbers)
+
+def segment_path(csv_path, number):
+    return f"{csv_path}.log.{number:08d}"
+
+def marker_path(csv_path):
+    return f"{csv_path}.compacting"
+#___________________________
+
+
+def read_batches(segment_path):
+    """Committed batches of a segment. A torn batch at the end (crash mid-write) was never acknowledged and is dropped."""
+    with open(segment_path, "rb") as f:
+        content = f.read()
+
+    batches = []
+    pos = 0
+    while pos < len(content):
+        header_end = content.find(b"\n", pos)
+        if header_end == -1 or not content.startswith(b"#batch ", pos):
+            break
+        size = int(content[pos + len(b"#batch "):header_end])
+        start, end = header_end + 1, header_end + 1 + size
+        if end > len(content):
+            break
+        batches.append(content[start:end])
+        pos = end
+
+    if pos < len(content):
+        print(f"Dropping {len(content) - pos} bytes of an incomplete batch at the end of {segment_path}")
+    return batches
+
+
+def write_all(f, content):
+    view = memoryview(content)
+    while view:
+        view = view[f.write(view):] # raw files can write less than asked
+
+
+def write_atomic(path, content):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_dir(path)
+
+
+def file_stamp(path):
+    """(inode, mtime, size) of a file, None if it does not exist. Changes whenever the file is written or replaced."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def fsync_dir(path):
+    """fsync the directory holding `path`, so files created, renamed or removed in it stay that way after a power loss."""
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
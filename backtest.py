@@ -0,0 +1,222 @@
+# Walk-forward backtesting of the forecast models
+# -------------------------------
+# Replays history with rolling origins: for every origin date, each model only gets to see what was known before
+# that date, predicts the following `horizon` days, and its predictions are compared with what actually happened.
+# Errors are reported per facility, model, target and horizon (days after the origin, grouped into buckets),
+# together with the time spent fitting, so models can be compared on accuracy per unit of compute.
+#
+# Models:
+#   forecast - predict_following_month_emission: Ridge fits on the same 30 days one year earlier
+#   ridge    - CO2_emssion_pattern: Ridge of capture efficiency on emissions, fitted on all history before the origin
+#   dtr      - CO2_emission_pattern_DTR: decision tree on region + site type + emissions, same history
+#
+# Facilities are backtested in parallel on a process pool. Each worker gets its facility's rows once and reuses
+# that slice, with its dates parsed once, for every origin and model.
+#
+#   python backtest.py dataset_file.csv --models forecast ridge dtr --step 30 --horizon 30 --out backtest.csv
+
+import argparse
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+import numpy as np
+import pandas as pd
+
+from insights import CO2_emssion_pattern, predict_following_month_emission, CO2_emission_pattern_DTR
+
+MODELS = ("forecast", "ridge", "dtr")
+MIN_TRAIN_ROWS = 30 # ridge/dtr origins with less history than this are skipped
+
+WARMUP = { # history a model needs before its first origin
+    "forecast": pd.DateOffset(years=1),           # last year's window
+    "ridge":    pd.Timedelta(days=MIN_TRAIN_ROWS),
+    "dtr":      pd.Timedelta(days=MIN_TRAIN_ROWS),
+}
+
+FORECAST_TARGETS = { # predicted column -> actual column
+    "predicted_capture_percent": "capture_efficiency_percent",
+    "predicted_storage_percent": "storage_integrity_percent",
+    "predicted_co2_emitted":     "co2_emitted_tonnes",
+}
+
+
+# Per-model predictions for one origin, as long-format rows (date, target, actual, predicted)___________
+def forecast_predictions(facility_data, dates, facility_name, origin, future):
+    results = predict_following_month_emission(facility_data, facility_name, today=origin)
+    if not isinstance(results, pd.DataFrame):
+        return None
+
+    actual = facility_data[future].assign(date=dates[future])
+    merged = results[["date", *FORECAST_TARGETS]].merge(actual[["date", *FORECAST_TARGETS.values()]], on="date")
+    return pd.concat([
+        pd.DataFrame({"date": merged["date"], "target": actual_col, "actual": merged[actual_col], "predicted": merged[predicted_col]})
+        for predicted_col, actual_col in FORECAST_TARGETS.items()
+    ], ignore_index=True)
+
+def history_predictions(fit, feature_columns):
+    def predict(facility_data, dates, facility_name, origin, future):
+        train = facility_data[dates < origin]
+        test = facility_data[future].assign(date=dates[future]).dropna(subset=["co2_emitted_tonnes", "capture_efficiency_percent"])
+        if len(train) < MIN_TRAIN_ROWS or test.empty:
+            return None
+        model = fit(train, facility_name)[0]
+        if model is None:
+            return None
+        return pd.DataFrame({
+            "date":      test["date"],
+            "target":    "capture_efficiency_percent",
+            "actual":    test["capture_efficiency_percent"],
+            "predicted": model.predict(test[feature_columns]),
+        })
+    return predict
+
+PREDICTORS = {
+    "forecast": forecast_predictions,
+    "ridge":    history_predictions(lambda train, name: CO2_emssion_pattern(train, name), ["co2_emitted_tonnes"]),
+    "dtr":      history_predictions(lambda train, name: CO2_emission_pattern_DTR(train, name), ["region", "storage_site_type", "co2_emitted_tonnes"]),
+}
+#___________________________
+
+
+def backtest_facility(facility_data, facility_name, models, origins, horizon):
+    """Runs in a worker process. Returns (prediction rows for every origin and model, {model: [fit seconds, fits]})."""
+    dates = pd.to_datetime(facility_data["date"], errors="coerce").dt.normalize() # parsed once, reused for every origin
+    first_origin = {model: dates.min() + WARMUP[model] for model in models}
+    frames = []
+    timings = {model: [0.0, 0] for model in models}
+
+    for origin in origins:
+        future = (dates >= origin) & (dates <= origin + pd.Timedelta(days=horizon))
+        if not future.any():
+            continue
+        for model in models:
+            if origin < first_origin[model]: # not enough history yet, not worth a (timed) call
+                continue
+            started = time.perf_counter()
+            with redirect_stdout(io.StringIO()): # the insights functions print every fit
+                predictions = PREDICTORS[model](facility_data, dates, facility_name, origin, future)
+            timings[model][0] += time.perf_counter() - started
+            timings[model][1] += 1
+            if predictions is not None and not predictions.empty:
+                frames.append(predictions.assign(model=model, origin=origin))
+
+    predictions = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if not predictions.empty:
+        predictions["facility_name"] = facility_name
+        predictions["horizon"] = (predictions["date"] - predictions["origin"]).dt.days
+    return predictions, timings
+
+
+def rolling_origins(data, models, horizon, step, start=None, end=None):
+    dates = pd.to_datetime(data["date"], errors="coerce").dropna().dt.normalize()
+    # From the first origin any of the models can use, each model skips the origins it does not have the history for yet
+    start = pd.Timestamp(start) if start else min(dates.min() + WARMUP[model] for model in models)
+    end = pd.Timestamp(end) if end else dates.max() - pd.Timedelta(days=horizon)
+    if start > end:
+        return []
+    return list(pd.date_range(start, end, freq=f"{step}D"))
+
+
+def run_backtest(data, models=MODELS, horizon=30, step=30, start=None, end=None, workers=None, facilities=None):
+    """Backtest every facility in parallel. Returns (prediction rows, fit timings per model)."""
+    origins = rolling_origins(data, models, horizon, step, start, end)
+    if not origins:
+        raise ValueError("Not enough history for a single origin, try a smaller --horizon or an earlier --start")
+
+    slices = {name: rows for name, rows in data.groupby("facility_name", sort=False)} # one slice per facility, shipped once
+    if facilities:
+        unknown = [name for name in facilities if name not in slices]
+        if unknown:
+            raise ValueError(f"No rows for facilities {unknown} in the csv, expected some of {list(slices)}")
+        slices = {name: slices[name] for name in facilities}
+    print(f"Backtesting {len(slices)} facilities x {len(origins)} origins x {len(models)} models")
+
+    frames = []
+    timings = {model: [0.0, 0] for model in models}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=multiprocessing.get_context("spawn")) as executor:
+        jobs = {name: executor.submit(backtest_facility, rows, name, list(models), origins, horizon) for name, rows in slices.items()}
+        for name, job in jobs.items():
+            predictions, facility_timings = job.result()
+            frames.append(predictions)
+            for model, (seconds, fits) in facility_timings.items():
+                timings[model][0] += seconds
+                timings[model][1] += fits
+            print(f"  {name}: {len(predictions)} predictions")
+
+    return pd.concat(frames, ignore_index=True), timings
+
+
+def error_metrics(predictions, bucket=7):
+    """MAE, RMSE and MAPE per facility, model, target and horizon bucket (first day of the bucket)."""
+    errors = predictions.assign(
+        horizon=(predictions["horizon"] // bucket) * bucket,
+        abs_error=(predictions["predicted"] - predictions["actual"]).abs(),
+    )
+    errors["sq_error"] = errors["abs_error"] ** 2
+    errors["pct_error"] = errors["abs_error"] / errors["actual"].abs().replace(0, np.nan) * 100
+
+    metrics = errors.groupby(["facility_name", "model", "target", "horizon"]).agg(
+        n=("abs_error", "size"),
+        mae=("abs_error", "mean"),
+        rmse=("sq_error", "mean"),
+        mape=("pct_error", "mean"),
+    ).reset_index()
+    metrics["rmse"] = np.sqrt(metrics["rmse"])
+    return metrics
+
+
+def model_summary(metrics, timings):
+    """One row per model and target: average error over facilities and horizons next to the fitting cost."""
+    weighted = metrics.assign(
+        abs_total=metrics["mae"] * metrics["n"],
+        pct_total=metrics["mape"] * metrics["n"],
+        pct_n=metrics["n"].where(metrics["mape"].notna(), 0), # groups whose actuals were all 0 have no MAPE
+    )
+    summary = weighted.groupby(["model", "target"]).agg(
+        n=("n", "sum"), abs_total=("abs_total", "sum"), pct_total=("pct_total", "sum"), pct_n=("pct_n", "sum"),
+    ).reset_index()
+    summary["mae"] = summary.pop("abs_total") / summary["n"]
+    summary["mape"] = summary.pop("pct_total") / summary.pop("pct_n").replace(0, np.nan)
+    summary["fit_seconds"] = summary["model"].map(lambda model: timings[model][0])
+    summary["ms_per_fit"] = summary["model"].map(lambda model: 1000 * timings[model][0] / max(timings[model][1], 1))
+    return summary[["model", "target", "n", "mae", "mape", "fit_seconds", "ms_per_fit"]]
+
+
+#Run from cli______________________________
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the forecast models over every facility")
+    parser.add_argument("csv_file", type=str, help="Path to the csv with emission data")
+    parser.add_argument("--models", nargs="+", choices=MODELS, default=list(MODELS), help="Models to backtest")
+    parser.add_argument("--facility", nargs="+", default=None, help="Only these facilities (default: all)")
+    parser.add_argument("--horizon", type=int, default=30, help="Days predicted after each origin")
+    parser.add_argument("--step", type=int, default=30, help="Days between two origins")
+    parser.add_argument("--bucket", type=int, default=7, help="Horizon bucket size in days for the report")
+    parser.add_argument("--start", type=str, default=None, help="First origin (default: once there is enough history)")
+    parser.add_argument("--end", type=str, default=None, help="Last origin (default: horizon days before the last row)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--out", type=str, default=None, help="Write the per facility/horizon metrics to this csv")
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.csv_file)
+    predictions, timings = run_backtest(data, args.models, args.horizon, args.step, args.start, args.end, args.workers, args.facility)
+    if predictions.empty:
+        print("No origin produced predictions to score.")
+        return
+
+    metrics = error_metrics(predictions, args.bucket)
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(metrics.to_string(index=False, float_format="%.3f"))
+        print()
+        print(model_summary(metrics, timings).to_string(index=False, float_format="%.3f"))
+    if args.out:
+        metrics.to_csv(args.out, index=False)
+        print(f"Metrics written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
+#_________________________________________________________
@@ -0,0 +1,114 @@
+# Execution layer for model fits
+# -------------------------------
+# The fits in insights.py are plain CPU work that holds the GIL, so running them inline blocks the
+# FastAPI event loop and serialises the gRPC worker threads. FitPool runs them on a bounded process pool instead.
+#
+# - Single flight: identical fits that are already running, keyed by (facility, model, dataset version, options),
+#   share one computation. Every caller gets the same Future.
+# - Backpressure: at most `max_pending` distinct fits are queued or running. Past that, submit() waits up to
+#   `block_s` seconds for a slot and then raises FitPoolSaturated, which the servers turn into 503 / RESOURCE_EXHAUSTED.
+# - Recovery: a worker that dies (OOM killer, segfault) breaks a ProcessPoolExecutor for good. The fits that were
+#   running fail with BrokenProcessPool, and the pool is replaced with a fresh one for everything after them.
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from insights import CO2_emssion_pattern, predict_following_month_emission, CO2_emission_pattern_DTR, CO2_anomaly_flags
+
+MODELS = {
+    "ridge":    CO2_emssion_pattern,               # emissions vs capture efficiency
+    "forecast": predict_following_month_emission,  # next 30 days from last year's window
+    "dtr":      CO2_emission_pattern_DTR,          # region + site type + emissions
+    "anomaly":  CO2_anomaly_flags,                 # re-flag every row of a facility (rescore.py)
+}
+
+
+class FitPoolSaturated(Exception):
+    pass
+
+
+def run_fit(model_name, facility_data, facility_name, options):
+    # Runs inside the worker process, so it has to stay a top-level function
+    return MODELS[model_name](facility_data, facility_name, **options)
+
+
+class FitPool:
+
+    def __init__(self, max_workers=None, max_pending=None, block_s=0):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.max_workers
+        self.block_s     = block_s
+
+        self._executor = self._new_executor()
+        self._slots    = threading.BoundedSemaphore(self.max_pending)
+        self._lock     = threading.Lock()
+        self._inflight = {}
+
+    def submit(self, model_name, data, facility_name, dataset_version, block_s=None, **options):
+        """Fit `model_name` for one facility. Returns a concurrent.futures.Future with whatever the insights function returns."""
+        if model_name not in MODELS:
+            raise ValueError(f"Unknown model {model_name!r}, expected one of {list(MODELS)}")
+
+        key = (facility_name, model_name, dataset_version, tuple(sorted(options.items())))
+        with self._lock:
+            future = self._inflight.get(key)
+        if future is not None:
+            return future # same fit already running, join it
+
+        block_s = self.block_s if block_s is None else block_s
+        acquired = self._slots.acquire(timeout=block_s) if block_s > 0 else self._slots.acquire(blocking=False)
+        if not acquired:
+            raise FitPoolSaturated(f"All {self.max_pending} fit slots are busy")
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None: # someone started it while we were waiting for a slot
+                self._slots.release()
+                return future
+
+            # Only ship the facility's rows to the worker, every model filters on facility_name first anyway
+            if "facility_name" in data.columns:
+                data = data[data["facility_name"] == facility_name]
+            try:
+                executor = self._executor
+                try:
+                    future = executor.submit(run_fit, model_name, data, facility_name, options)
+                except BrokenProcessPool: # died since the last fit finished, nobody noticed yet
+                    self._restart(executor)
+                    executor = self._executor
+                    future = executor.submit(run_fit, model_name, data, facility_name, options)
+            except Exception:
+                self._slots.release()
+                raise
+            self._inflight[key] = future
+
+        future.add_done_callback(partial(self._finished, key, executor))
+        return future
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _new_executor(self):
+        # spawn, not fork: both servers already run threads (gRPC workers, the append log) when the first fit comes in
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _restart(self, broken):
+        # Called with self._lock held. Every fit of the broken pool fails, so none of them can be joined anymore
+        if self._executor is not broken:
+            return # already replaced by another failed fit
+        print("A fit worker died, restarting the fit pool")
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._new_executor()
+        self._inflight.clear()
+
+    def _finished(self, key, executor, future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+                self._restart(executor)
+        self._slots.release()
@@ -6,29 +6,172 @@ from io import BytesIO
 import grpc
 from concurrent import futures
 from datetime import datetime
+import numpy as np
 import pandas as pd
 from protos import service_pb2
 from protos import service_pb2_grpc
 import time
-from insights import seasonal_emission_forecasts, predict_following_month_emission
+from collections import deque
+from insights import seasonal_emission_forecasts
+from fit_pool import FitPool, FitPoolSaturated
+from workspace import DatasetWorkspace, DatasetNotFound
+
+
+STREAM_CHUNK_SIZE = 500 # rows per streamed PredictionStatsChunk when the client does not ask for one
+WORKSPACE_BUDGET_BYTES = 1024**3 # parsed datasets kept in memory, least recently used ones get evicted past this
+FIT_BLOCK_S = 30 # how long a gRPC worker thread waits for a free fit slot before answering RESOURCE_EXHAUSTED
+
+workspace = DatasetWorkspace(budget_bytes=WORKSPACE_BUDGET_BYTES)
+fit_pool = FitPool(max_workers=os.cpu_count(), block_s=FIT_BLOCK_S)
+
+
+def load_dataset(dataset_id, context):
+    """(data, version) of the requested dataset, or (None, None) with the error already set on the context."""
+    try:
+        data, version = workspace.get(dataset_id)
+    except (ValueError, DatasetNotFound) as e:
+        context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+        context.set_details(str(e))
+        return None, None
+
+    if data.empty:
+        context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+        context.set_details("No csv loaded. Use UploadCSV before anything.")
+        return None, None
+    return data, version
+
+
+def forecast(data, version, facility_name):
+    return fit_pool.submit("forecast", data, facility_name, version)
+
+
+def predict_facility(data, version, facility_name, context):
+    """Next month's predictions for one facility, or None with the error already set on the context."""
+    try:
+        prediction_stats = forecast(data, version, facility_name).result()
+    except FitPoolSaturated as e:
+        context.set_code(grpc.StatusCode.RESOURCE_EXHAUSTED)
+        context.set_details(str(e))
+        return None
+
+    if not isinstance(prediction_stats, pd.DataFrame): # returns None (or a None pair) when there is nothing to predict
+        context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+        context.set_details("No data available for this facility.")
+        return None
+    return prediction_stats
+
+
+def predict_facilities(data, version, facility_names, context):
+    """Yields (facility_name, predictions) in request order, keeping up to one fit per pool worker running ahead."""
+    facilities = deque(requested_facilities(data, facility_names))
+    pending = deque()
+    sent = 0
+    while facilities or pending:
+        try:
+            while facilities and len(pending) < fit_pool.max_workers:
+                pending.append((facilities[0], forecast(data, version, facilities[0])))
+                facilities.popleft()
+        except FitPoolSaturated as e:
+            if not pending: # none of our own fits is running that could free a slot
+                context.set_code(grpc.StatusCode.RESOURCE_EXHAUSTED)
+                context.set_details(str(e))
+                return
+
+        facility_name, future = pending.popleft()
+        prediction_stats = future.result()
+        if not isinstance(prediction_stats, pd.DataFrame):
+            print(f"No prediction stats for {facility_name}, skipping")
+            continue
+        sent += 1
+        yield facility_name, prediction_stats
+
+    if sent == 0:
+        context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+        context.set_details("No data available for the requested facilities.")
+
+
+# Proto builders. These read whole columns out of the frame instead of going row by row with iterrows()___________
+def seasonal_stats_to_proto(range_stats):
+    points = [
+        service_pb2.DataPoint(season=season, column=column, median=median, lower=lower, upper=upper)
+        for season, column, median, lower, upper in zip(
+            range_stats["season"].tolist(),
+            range_stats["column"].tolist(),
+            range_stats["median"].to_numpy(dtype=float).tolist(),
+            range_stats["lower"].to_numpy(dtype=float).tolist(),
+            range_stats["upper"].to_numpy(dtype=float).tolist(),
+        )
+    ]
+    return service_pb2.ChartData(points=points)
+
+
+def prediction_stats_to_proto(prediction_stats):
+    dates = pd.to_datetime(prediction_stats["date"]).dt.strftime("%Y-%m-%d %H:%M:%S").fillna("NaT")  # same text as str(Timestamp)
+    rows = [
+        service_pb2.PredictionData(
+            predicted_capture_percent=capture,
+            predicted_storage_percent=storage,
+            predicted_co2_emitted=emitted,
+            date_range=date,
+        )
+        for capture, storage, emitted, date in zip(
+            prediction_stats["predicted_capture_percent"].to_numpy(dtype=float).tolist(),
+            prediction_stats["predicted_storage_percent"].to_numpy(dtype=float).tolist(),
+            prediction_stats["predicted_co2_emitted"].to_numpy(dtype=float).tolist(),
+            dates.tolist(),
+        )
+    ]
+    return service_pb2.PredictionChartData(prediction_stats=rows)
+
+
+# Columnar builders. Each column goes into its repeated field in one go, no message per row___________
+def seasonal_stats_to_columns(range_stats):
+    season_index, seasons = pd.factorize(range_stats["season"]) # dictionary-encode the labels
+    column_index, columns = pd.factorize(range_stats["column"])
+    return service_pb2.SeasonalStatsColumns(
+        seasons=seasons.tolist(),
+        columns=columns.tolist(),
+        season_index=season_index.tolist(),
+        column_index=column_index.tolist(),
+        median=range_stats["median"].to_numpy(dtype=float).tolist(),
+        lower=range_stats["lower"].to_numpy(dtype=float).tolist(),
+        upper=range_stats["upper"].to_numpy(dtype=float).tolist(),
+    )
+
+
+def prediction_stats_to_columns(prediction_stats):
+    epoch_days = pd.to_datetime(prediction_stats["date"]).to_numpy().astype("datetime64[D]").astype(np.int64)
+    return service_pb2.PredictionStatsColumns(
+        epoch_day=epoch_days.tolist(),
+        predicted_capture_percent=prediction_stats["predicted_capture_percent"].to_numpy(dtype=float).tolist(),
+        predicted_storage_percent=prediction_stats["predicted_storage_percent"].to_numpy(dtype=float).tolist(),
+        predicted_co2_emitted=prediction_stats["predicted_co2_emitted"].to_numpy(dtype=float).tolist(),
+    )
+#___________________________
+
+
+def requested_facilities(data, facility_names):
+    if facility_names:
+        return list(facility_names)
+    return data["facility_name"].dropna().unique().tolist() # no names given -> every facility in the csv
+#___________________________
 
 
 class PredictionServiceServicer(service_pb2_grpc.PredictionAnalyticsServiceServicer):
 
     def UploadCSV(self, request, context):
         print("Upload request received")
-        global csv_path, data
-        csv_path = f"./dataset_file" + ".csv"
-
-        with open(csv_path, "wb") as f:
-            f.write(request.file_content)
-
         try:
-            data = pd.read_csv(csv_path)
+            csv_path, fmt = workspace.put(request.dataset_id, BytesIO(request.file_content)) # csv, gzip/zstd csv, Parquet or Arrow IPC
             return service_pb2.UploadCSVResponse(
                 status="success",
-                message=f"CSV uploaded and saved to {csv_path}"
+                message=f"{fmt} uploaded and saved to {csv_path}"
             )
+        except ValueError as e: # bad dataset name or a csv pandas cannot parse
+            print("Error:", e)
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            return service_pb2.UploadCSVResponse(status="failed", message="error")
         except Exception as e:
             print("Error:", e)
             context.set_details(str(e))
@@ -37,14 +180,8 @@ class PredictionServiceServicer(service_pb2_grpc.PredictionAnalyticsServiceServi
 
     def GetSeasonalStats(self, request, context):
 
-        global csv_path, data
-        csv_path = fr".\dataset_file.csv"
-        if os.path.exists(csv_path):
-            data = pd.read_csv(csv_path)
-
-        if data.empty:
-            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
-            context.set_details("No csv loaded. Use /set_csv/ before anything.")
+        data, version = load_dataset(request.dataset_id, context)
+        if data is None:
             return service_pb2.GetSeasonalResponse()
         range_stats = seasonal_emission_forecasts(data, request.facility_name)
 
@@ -53,20 +190,7 @@ class PredictionServiceServicer(service_pb2_grpc.PredictionAnalyticsServiceServi
             context.set_details("No data available for this facility.")
             return service_pb2.GetSeasonalResponse()
 
-        range_stats_output = {"points" : []}
-        for idx in range_stats["season"].keys():
-            point = {
-                "season": range_stats["season"][idx],
-                "column": range_stats["column"][idx],
-                "median": range_stats["median"][idx],
-                "lower":  range_stats["lower"][idx],
-                "upper":  range_stats["upper"][idx]
-            }
-            range_stats_output["points"].append(point)
-
-        range_stats_proto = service_pb2.ChartData(
-            points = range_stats_output["points"],
-        )
+        range_stats_proto = seasonal_stats_to_proto(range_stats)
 
         return service_pb2.GetSeasonalResponse(
             chart_data = range_stats_proto
@@ -75,42 +199,102 @@ class PredictionServiceServicer(service_pb2_grpc.PredictionAnalyticsServiceServi
 
     def GetPredictionStats(self, request, context):
 
-        global csv_path, data
-        csv_path = fr".\dataset_file.csv"
-        if os.path.exists(csv_path):
-            data = pd.read_csv(csv_path)
+        data, version = load_dataset(request.dataset_id, context)
+        if data is None:
+            return service_pb2.GetPredictionStatsResponse()
 
-        if data.empty:
-            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
-            context.set_details("No csv loaded. Use /set_csv/ before anything.")
+        prediction_stats = predict_facility(data, version, request.facility_name, context)
+        if prediction_stats is None:
             return service_pb2.GetPredictionStatsResponse()
+        chart_data = prediction_stats_to_proto(prediction_stats)
+        return service_pb2.GetPredictionStatsResponse(
+           prediction_stats=chart_data,
+        )
 
-        prediction_stats = predict_following_month_emission(data, request.facility_name)
 
-        if prediction_stats is None:
+    # Streaming versions: one facility is computed at a time and sent as soon as it is ready,
+    # so the client gets the first chunk before the rest are done and no single message gets too big
+    def StreamSeasonalStats(self, request, context):
+
+        data, version = load_dataset(request.dataset_id, context)
+        if data is None:
+            return
+
+        sent = 0
+        for facility_name in requested_facilities(data, request.facility_names):
+            range_stats = seasonal_emission_forecasts(data, facility_name)
+            if range_stats is None:
+                print(f"No seasonal stats for {facility_name}, skipping")
+                continue
+            sent += 1
+            yield service_pb2.SeasonalStatsChunk(
+                facility_name=facility_name,
+                chart_data=seasonal_stats_to_proto(range_stats),
+            )
+
+        if sent == 0:
             context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
-            context.set_details("No data available for this facility.")
-            return service_pb2.GetPredictionStatsResponse()
+            context.set_details("No data available for the requested facilities.")
+
+
+    def StreamPredictionStats(self, request, context):
 
+        data, version = load_dataset(request.dataset_id, context)
+        if data is None:
+            return
 
-        prediction_stats_proto = []
-        for _, row in prediction_stats.iterrows():
-            prediction_stats_proto.append(
-                service_pb2.PredictionData(
-                    predicted_capture_percent=row["predicted_capture_percent"],
-                    predicted_storage_percent=row["predicted_storage_percent"],
-                    predicted_co2_emitted=row["predicted_co2_emitted"],
-                    date_range=str(row["date"]),  # adjust column names
+        chunk_size = request.chunk_size if request.chunk_size > 0 else STREAM_CHUNK_SIZE
+        for facility_name, prediction_stats in predict_facilities(data, version, request.facility_names, context):
+            for start in range(0, len(prediction_stats), chunk_size):
+                yield service_pb2.PredictionStatsChunk(
+                    facility_name=facility_name,
+                    prediction_stats=prediction_stats_to_proto(prediction_stats.iloc[start:start + chunk_size]),
                 )
-            )
-        chart_data= service_pb2.PredictionChartData(
-           prediction_stats=prediction_stats_proto,
-        )
-        return service_pb2.GetPredictionStatsResponse(
-           prediction_stats=chart_data,
-        )
 
 
+    # Columnar versions: packed columns, epoch-day dates and dictionary-encoded labels instead of a message per row
+    def GetSeasonalStatsColumnar(self, request, context):
+
+        data, version = load_dataset(request.dataset_id, context)
+        if data is None:
+            return service_pb2.SeasonalStatsColumns()
+
+        range_stats = seasonal_emission_forecasts(data, request.facility_name)
+        if range_stats is None:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("No data available for this facility.")
+            return service_pb2.SeasonalStatsColumns()
+
+        return seasonal_stats_to_columns(range_stats)
+
+
+    def GetPredictionStatsColumnar(self, request, context):
+
+        data, version = load_dataset(request.dataset_id, context)
+        if data is None:
+            return service_pb2.PredictionStatsColumns()
+
+        prediction_stats = predict_facility(data, version, request.facility_name, context)
+        if prediction_stats is None:
+            return service_pb2.PredictionStatsColumns()
+
+        return prediction_stats_to_columns(prediction_stats)
+
+
+    def StreamPredictionStatsColumnar(self, request, context):
+
+        data, version = load_dataset(request.dataset_id, context)
+        if data is None:
+            return
+
+        chunk_size = request.chunk_size if request.chunk_size > 0 else STREAM_CHUNK_SIZE
+        for facility_name, prediction_stats in predict_facilities(data, version, request.facility_names, context):
+            for start in range(0, len(prediction_stats), chunk_size):
+                yield service_pb2.PredictionColumnsChunk(
+                    facility_name=facility_name,
+                    columns=prediction_stats_to_columns(prediction_stats.iloc[start:start + chunk_size]),
+                )
+
 def serve():
     server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
     service_pb2_grpc.add_PredictionAnalyticsServiceServicer_to_server(PredictionServiceServicer(), server)
@@ -123,6 +307,8 @@ def serve():
     except KeyboardInterrupt:
         print("Stopping server...")
         server.stop(0)
+        fit_pool.shutdown()
+        workspace.close()
 
 if __name__ == '__main__':
     serve()
\ No newline at end of file
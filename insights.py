@@ -13,6 +13,13 @@ from sklearn.compose import ColumnTransformer           # Combines numeric + tex
 from sklearn.pipeline import Pipeline                   # Chains together data processing steps
 import matplotlib.dates as mdates                       # For formatting dates on graphs
 
+ANOMALY_THRESHOLD = 0.9   # capture efficiency below this share of the predicted efficiency is flagged as an anomaly
+ANOMALY_INPUT_COLUMNS = [ # a row missing any of these is flagged as well (same fields as service.GlobalInput)
+    "date", "facility_id", "facility_name", "country", "region", "storage_site_type",
+    "co2_emitted_tonnes", "co2_captured_tonnes", "co2_stored_tonnes",
+    "capture_efficiency_percent", "storage_integrity_percent",
+]
+
 # -------------------------------------------------------------------------------------
 # FUNCTION 1: Live CO₂ Stats (efficiency over time + anomalies)
 # What it does: Shows capture efficiency of a facility over time and highlights anomalies.
@@ -178,7 +185,7 @@ def CO2_emssion_pattern(data, facility_name, plot=False, scatter=False):
     Based on last year’s same period.
     """
 
-def predict_following_month_emission(data, facility_name):
+def predict_following_month_emission(data, facility_name, today=None):   # today: forecast as if it were this date (used by backtest.py), default is the real today
     filtered = data[data["facility_name"] == facility_name].dropna(            # STEP 1: Filter facility rows + clean dates
         subset=["co2_emitted_tonnes", "capture_efficiency_percent", "storage_integrity_percent", "date"]
     )
@@ -187,7 +194,7 @@ def predict_following_month_emission(data, facility_name):
         return None, None
     filtered["date"] = pd.to_datetime(filtered["date"], errors="coerce").dt.normalize()
     filtered = filtered.dropna(subset=["date"])
-    today = pd.Timestamp.today().normalize()                                   # STEP 2: Define "this year" vs "last year" time window
+    today = pd.Timestamp(today if today is not None else pd.Timestamp.today()).normalize()   # STEP 2: Define "this year" vs "last year" time window
     end_date = today + pd.Timedelta(days=30)
     last_year_today = today - pd.DateOffset(years=1)
     last_year_end = end_date - pd.DateOffset(years=1)
@@ -219,7 +226,7 @@ def predict_following_month_emission(data, facility_name):
     pe_model = Ridge() # pe - predicted emission
     pe_model.fit(pe_features, pe_target)
     results["predicted_co2_emitted"] = pe_model.predict(pe_features)
-    results["date"] = results["date"].apply(lambda d: d.replace(year=2025) if pd.notnull(d) else d)             # STEP 5: Shift predictions to current year
+    results["date"] = results["date"] + pd.DateOffset(years=1)                                                 # STEP 5: Shift predictions to current year
     results["date_range"] = results["date"]
 
     return results                                                 # STEP 6: Output = DataFrame of next 30 days predictions
@@ -265,6 +272,33 @@ def CO2_emission_pattern_DTR(data, facility_name, plot=False, scatter = False):
 
     return model, importance_df                                                     # STEP 6: Output = trained model + importance table
 # -------------------------------------------------------------------------------------
+# FUNCTION 6: Anomaly flags for a whole facility at once (used by rescore.py)
+# What it does: Same rule as /update_csv/ applies to one new row, but for every row of the facility in one pass:
+#   a row is an anomaly if any input value is missing, or if its capture efficiency is at or below
+#   `threshold` x the efficiency the Ridge model (FUNCTION 3) predicts for its emissions.
+# start/end limit which rows get new flags, the model is still fitted on all of the facility's rows.
+
+def CO2_anomaly_flags(data, facility_name, threshold=ANOMALY_THRESHOLD, start=None, end=None):
+    filtered = data[data["facility_name"] == facility_name]                              # STEP 1: Rows of the facility
+
+    in_scope = pd.Series(True, index=filtered.index)                                      # STEP 2: Rows to re-flag
+    if start is not None or end is not None:
+        dates = pd.to_datetime(filtered["date"], errors="coerce").dt.normalize()
+        if start is not None:
+            in_scope &= dates >= pd.Timestamp(start)
+        if end is not None:
+            in_scope &= dates <= pd.Timestamp(end)
+
+    flags = filtered.reindex(columns=ANOMALY_INPUT_COLUMNS).isna().any(axis=1)           # STEP 3: Missing values
+
+    model = CO2_emssion_pattern(filtered, facility_name)[0]                               # STEP 4: Same model as /update_csv/
+    if model is not None:
+        usable = filtered.dropna(subset=["co2_emitted_tonnes", "capture_efficiency_percent"])
+        predicted = model.predict(usable[["co2_emitted_tonnes"]])                         # STEP 5: Predict every row at once
+        flags.loc[usable.index] |= usable["capture_efficiency_percent"].to_numpy() <= threshold * predicted
+
+    return flags[in_scope]                                                                # STEP 6: Output = new flag per row index
+# -------------------------------------------------------------------------------------
         
 
 #Run from cli______________________________
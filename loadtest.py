@@ -0,0 +1,371 @@
+# Load generator for the FastAPI app and the gRPC server
+# -------------------------------
+# Replays a traffic mix against both servers and reports throughput, p50/p99 latency and error rate,
+# so capacity can be planned without a live SingularityNET daemon in front.
+#
+# The mix uses the same jsonl layout as our request captures: one JSON object per line with
+# "request_id", "title" and "body". "title" is the operation (see OPERATIONS below) and "body" holds its arguments,
+# either as an object or as a JSON string. Lines are replayed in order and the mix wraps around until we are done.
+#
+#   {"request_id": "r1", "title": "UploadCSV", "body": {"path": "dataset_file.csv", "shift_dates": true}}
+#   {"request_id": "r2", "title": "GetPredictionStats", "body": {"facility_name": "Alpha CCS Plant", "dataset_id": "fleet"}}
+#
+# FastAPI operations take the dataset as "dataset" in the body, it is sent as the query parameter.
+# Uploads with "shift_dates" send a copy of the csv with every date moved so the newest row is yesterday: the
+# forecasts need last year's window around today, which fixed sample data stops having after a while.
+#
+# Before measuring, a warm-up pass (--warmup requests, not counted) gets the fit pools' worker processes started.
+#
+# By default both servers are started in-process on free localhost ports, inside a scratch copy of the
+# working directory so the load test never overwrites ./dataset_file.csv. Pass --http / --grpc to hit running servers instead.
+#
+#   python loadtest.py loadtest_mix.jsonl --concurrency 16 --requests 2000
+#   python loadtest.py loadtest_mix.jsonl --grpc localhost:50051 --duration 60 --json
+
+import argparse
+import itertools
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+import numpy as np
+
+SERVER_START_TIMEOUT_S = 30 # how long to wait for the in-process uvicorn server to come up
+
+
+# Operations___________________________
+def http_upload_csv(target, body):
+    with open(body["path"], "rb") as f:
+        content = f.read()
+    boundary = uuid.uuid4().hex
+    payload = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{os.path.basename(body['path'])}\"\r\n"
+        f"Content-Type: text/csv\r\n\r\n"
+    ).encode("utf-8") + content + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return http_call(target, "POST", "/upload_csv/" + dataset_query(body), payload, f"multipart/form-data; boundary={boundary}")
+
+def http_update_csv(target, body):
+    entry = {key: value for key, value in body.items() if key != "dataset"}
+    return http_call(target, "POST", "/update_csv/" + dataset_query(body), json.dumps(entry).encode("utf-8"), "application/json")
+
+def http_get_seasonal_stats(target, body):
+    return http_call(target, "GET", "/get_seasonal_stats/?" + urllib.parse.urlencode(body))
+
+def http_list_datasets(target, body):
+    return http_call(target, "GET", "/datasets/")
+
+def http_get_graph(target, body):
+    return http_call(target, "GET", "/get_graph/?" + urllib.parse.urlencode(body))
+
+def dataset_query(body):
+    return "?" + urllib.parse.urlencode({"dataset": body["dataset"]}) if body.get("dataset") else ""
+
+def http_call(target, method, path, payload=None, content_type=None):
+    request = urllib.request.Request(target + path, data=payload, method=method)
+    if content_type:
+        request.add_header("Content-Type", content_type)
+    with urllib.request.urlopen(request, timeout=120) as response:
+        response.read()
+
+
+def grpc_upload_csv(stub, body):
+    from protos import service_pb2
+    with open(body["path"], "rb") as f:
+        stub.UploadCSV(service_pb2.UploadCSVRequest(file_content=f.read(), dataset_id=body.get("dataset_id", "")), timeout=120)
+
+def grpc_get_seasonal_stats(stub, body):
+    from protos import service_pb2
+    stub.GetSeasonalStats(service_pb2.GetSeasonalStatsRequest(**body), timeout=120)
+
+def grpc_get_prediction_stats(stub, body):
+    from protos import service_pb2
+    stub.GetPredictionStats(service_pb2.GetPredictionStatsRequest(**body), timeout=120)
+
+def grpc_stream_seasonal_stats(stub, body):
+    from protos import service_pb2
+    for _ in stub.StreamSeasonalStats(service_pb2.StreamSeasonalStatsRequest(**body), timeout=120):
+        pass
+
+def grpc_stream_prediction_stats(stub, body):
+    from protos import service_pb2
+    for _ in stub.StreamPredictionStats(service_pb2.StreamPredictionStatsRequest(**body), timeout=120):
+        pass
+
+def grpc_get_seasonal_stats_columnar(stub, body):
+    from protos import service_pb2
+    stub.GetSeasonalStatsColumnar(service_pb2.GetSeasonalStatsRequest(**body), timeout=120)
+
+def grpc_get_prediction_stats_columnar(stub, body):
+    from protos import service_pb2
+    stub.GetPredictionStatsColumnar(service_pb2.GetPredictionStatsRequest(**body), timeout=120)
+
+def grpc_stream_prediction_stats_columnar(stub, body):
+    from protos import service_pb2
+    for _ in stub.StreamPredictionStatsColumnar(service_pb2.StreamPredictionStatsRequest(**body), timeout=120):
+        pass
+
+
+OPERATIONS = { # title in the mix -> (which server, call)
+    "upload_csv":            ("http", http_upload_csv),
+    "update_csv":            ("http", http_update_csv),
+    "get_seasonal_stats":    ("http", http_get_seasonal_stats),
+    "get_graph":             ("http", http_get_graph),
+    "datasets":              ("http", http_list_datasets),
+    "UploadCSV":             ("grpc", grpc_upload_csv),
+    "GetSeasonalStats":      ("grpc", grpc_get_seasonal_stats),
+    "GetPredictionStats":    ("grpc", grpc_get_prediction_stats),
+    "StreamSeasonalStats":   ("grpc", grpc_stream_seasonal_stats),
+    "StreamPredictionStats": ("grpc", grpc_stream_prediction_stats),
+    "GetSeasonalStatsColumnar":      ("grpc", grpc_get_seasonal_stats_columnar),
+    "GetPredictionStatsColumnar":    ("grpc", grpc_get_prediction_stats_columnar),
+    "StreamPredictionStatsColumnar": ("grpc", grpc_stream_prediction_stats_columnar),
+}
+#___________________________
+
+
+def load_mix(path):
+    mix = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry["title"] not in OPERATIONS:
+                raise ValueError(f"{path}:{line_no}: unknown operation {entry['title']!r}, expected one of {list(OPERATIONS)}")
+            body = entry.get("body") or {}
+            if isinstance(body, str):
+                body = json.loads(body)
+            mix.append((entry.get("request_id", str(line_no)), entry["title"], body))
+    if not mix:
+        raise ValueError(f"{path} has no requests in it")
+    return mix
+
+
+def shift_to_today(path, out_dir):
+    """Copy of the csv at `path` with every date moved by the same number of days, so the newest row is yesterday."""
+    import pandas as pd
+    from upload_formats import csv_dates
+
+    data = pd.read_csv(path)
+    dates = pd.to_datetime(data["date"], format="%m/%d/%Y", errors="coerce")
+    yesterday = pd.Timestamp.today().normalize() - pd.Timedelta(days=1)
+    data["date"] = csv_dates(dates + (yesterday - dates.max()))
+    shifted = os.path.join(out_dir, os.path.basename(path))
+    data.to_csv(shifted, index=False)
+    return shifted
+
+
+# In-process servers___________________________
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_http():
+    import uvicorn
+    import service
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(service.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + SERVER_START_TIMEOUT_S
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("The FastAPI server exited before it started, see the uvicorn output above")
+        if time.monotonic() > deadline:
+            server.should_exit = True
+            raise RuntimeError(f"The FastAPI server did not start within {SERVER_START_TIMEOUT_S}s")
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+    return f"http://127.0.0.1:{port}", stop
+
+def start_grpc(workers, workspace=None):
+    import grpc
+    from concurrent import futures
+    from protos import service_pb2_grpc
+    import grpc_server
+
+    if workspace is not None: # in one process both servers have to go through the same workspace and append logs
+        grpc_server.workspace = workspace
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers))
+    service_pb2_grpc.add_PredictionAnalyticsServiceServicer_to_server(grpc_server.PredictionServiceServicer(), server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+
+    def stop():
+        server.stop(0)
+        grpc_server.fit_pool.shutdown()
+        if workspace is None:
+            grpc_server.workspace.close()
+    return f"127.0.0.1:{port}", stop
+#___________________________
+
+
+def run(mix, http_target, grpc_stub, concurrency, total_requests=None, duration_s=None):
+    """Replay the mix from `concurrency` threads. Returns {operation: [(latency seconds, error or None), ...]} and the wall time."""
+    feed = itertools.cycle(mix)
+    feed_lock = threading.Lock()
+    issued = itertools.count()
+    results = {title: [] for _, title, _ in mix}
+    results_lock = threading.Lock()
+    deadline = time.perf_counter() + duration_s if duration_s else None
+
+    def worker():
+        while True:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            if total_requests is not None and next(issued) >= total_requests:
+                return
+            with feed_lock:
+                _, title, body = next(feed)
+
+            kind, call = OPERATIONS[title]
+            error = None
+            started = time.perf_counter()
+            try:
+                call(http_target if kind == "http" else grpc_stub, body)
+            except urllib.error.HTTPError as e:
+                error = f"HTTP {e.code}"
+            except Exception as e:
+                code = getattr(e, "code", None)
+                error = f"gRPC {code().name}" if callable(code) else type(e).__name__
+            latency = time.perf_counter() - started
+
+            with results_lock:
+                results[title].append((latency, error))
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def summarize(results, wall_s):
+    def stats(samples):
+        latencies = np.array([latency for latency, _ in samples]) * 1000
+        errors = [error for _, error in samples if error is not None]
+        kinds = {}
+        for error in errors:
+            kinds[error] = kinds.get(error, 0) + 1
+        return {
+            "requests":       len(samples),
+            "throughput_rps": len(samples) / wall_s if wall_s else 0.0,
+            "p50_ms":         float(np.percentile(latencies, 50)) if len(samples) else None,
+            "p99_ms":         float(np.percentile(latencies, 99)) if len(samples) else None,
+            "error_rate":     len(errors) / len(samples) if samples else 0.0,
+            "errors":         kinds,
+        }
+
+    report = {title: stats(samples) for title, samples in results.items() if samples}
+    report["total"] = stats([sample for samples in results.values() for sample in samples])
+    report["total"]["wall_s"] = wall_s
+    return report
+
+
+def print_report(report):
+    width = max(24, *(len(title) + 2 for title in report))
+    print(f"{'operation':<{width}}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>9}")
+    for title, row in report.items():
+        p50 = f"{row['p50_ms']:.1f}" if row["p50_ms"] is not None else "-"
+        p99 = f"{row['p99_ms']:.1f}" if row["p99_ms"] is not None else "-"
+        print(f"{title:<{width}}{row['requests']:>10}{row['throughput_rps']:>10.1f}{p50:>10}{p99:>10}{row['error_rate']:>9.1%}")
+        for error, count in row["errors"].items():
+            print(f"{'':<{width + 2}}{error}: {count}")
+
+
+#Run from cli______________________________
+def main():
+    parser = argparse.ArgumentParser(description="Replay a traffic mix against the FastAPI app and the gRPC server")
+    parser.add_argument("mix", type=str, help="jsonl file with the traffic mix (request_id, title, body per line)")
+    parser.add_argument("--http", type=str, default=None, help="Base URL of a running FastAPI app. Default: start one in-process")
+    parser.add_argument("--grpc", type=str, default=None, help="host:port of a running gRPC server. Default: start one in-process")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of client threads")
+    parser.add_argument("--requests", type=int, default=None, help="Stop after this many requests in total")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+    parser.add_argument("--warmup", type=int, default=None, help="Requests sent before measuring, not counted (default: twice the mix)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    mix = load_mix(args.mix)
+    if args.requests is None and args.duration is None:
+        args.requests = 10 * len(mix)
+    if args.warmup is None:
+        args.warmup = 2 * max(len(mix), args.concurrency)
+    kinds = {OPERATIONS[title][0] for _, title, _ in mix}
+
+    datadir = tempfile.mkdtemp(prefix="aurora-loadtest-data-") # date shifted upload copies
+    shifted = {}
+    for index, (request_id, title, body) in enumerate(mix): # uploads are read by the client, resolve them before we chdir
+        if "path" in body:
+            path = os.path.abspath(body["path"])
+            if body.get("shift_dates"):
+                if path not in shifted:
+                    shifted[path] = shift_to_today(path, datadir)
+                path = shifted[path]
+            mix[index] = (request_id, title, {key: value for key, value in body.items() if key != "shift_dates"} | {"path": path})
+
+    stops = []
+    workdir = None
+    if ("http" in kinds and args.http is None) or ("grpc" in kinds and args.grpc is None):
+        # In-process servers read and write ./dataset_file.csv, give them their own copy
+        workdir = tempfile.mkdtemp(prefix="aurora-loadtest-")
+        if os.path.exists("dataset_file.csv"):
+            shutil.copy("dataset_file.csv", workdir)
+        os.chdir(workdir)
+
+    try:
+        http_target = args.http
+        shared_workspace = None
+        if "http" in kinds and http_target is None:
+            http_target, stop = start_http()
+            stops.append(stop)
+            import service
+            shared_workspace = service.workspace
+
+        grpc_stub = None
+        if "grpc" in kinds:
+            import grpc
+            from protos import service_pb2_grpc
+            grpc_target = args.grpc
+            if grpc_target is None:
+                grpc_target, stop = start_grpc(workers=max(10, args.concurrency), workspace=shared_workspace)
+                stops.append(stop)
+            grpc_stub = service_pb2_grpc.PredictionAnalyticsServiceStub(grpc.insecure_channel(grpc_target))
+
+        if args.warmup > 0:
+            if not args.json:
+                print(f"Warming up with {args.warmup} requests (not counted)")
+            run(mix, http_target, grpc_stub, args.concurrency, args.warmup)
+        results, wall_s = run(mix, http_target, grpc_stub, args.concurrency, args.requests, args.duration)
+    finally:
+        for stop in reversed(stops):
+            stop()
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+        shutil.rmtree(datadir, ignore_errors=True)
+
+    report = summarize(results, wall_s)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
+#_________________________________________________________
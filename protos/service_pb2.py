@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x14protos/service.proto\x12\x13PredictionAnalytics\"(\n\x10UploadCSVRequest\x12\x14\n\x0c\x66ile_content\x18\x01 \x01(\x0c\"4\n\x11UploadCSVResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x0f\n\x07message\x18\x02 \x01(\t\"0\n\x17GetSeasonalStatsRequest\x12\x15\n\rfacility_name\x18\x01 \x01(\t\"2\n\x19GetPredictionStatsRequest\x12\x15\n\rfacility_name\x18\x01 \x01(\t\"Y\n\tDataPoint\x12\x0e\n\x06season\x18\x01 \x01(\t\x12\x0e\n\x06\x63olumn\x18\x02 \x01(\t\x12\x0e\n\x06median\x18\x03 \x01(\x01\x12\r\n\x05lower\x18\x04 \x01(\x01\x12\r\n\x05upper\x18\x05 \x01(\x01\"\x89\x01\n\x0ePredictionData\x12!\n\x19predicted_capture_percent\x18\x01 \x01(\x01\x12!\n\x19predicted_storage_percent\x18\x02 \x01(\x01\x12\x1d\n\x15predicted_co2_emitted\x18\x03 \x01(\x01\x12\x12\n\ndate_range\x18\x04 \x01(\t\";\n\tChartData\x12.\n\x06points\x18\x01 \x03(\x0b\x32\x1e.PredictionAnalytics.DataPoint\"T\n\x13PredictionChartData\x12=\n\x10prediction_stats\x18\x01 \x03(\x0b\x32#.PredictionAnalytics.PredictionData\"I\n\x13GetSeasonalResponse\x12\x32\n\nchart_data\x18\x01 \x01(\x0b\x32\x1e.PredictionAnalytics.ChartData\"`\n\x1aGetPredictionStatsResponse\x12\x42\n\x10prediction_stats\x18\x01 \x01(\x0b\x32(.PredictionAnalytics.PredictionChartData2\xdb\x02\n\x1aPredictionAnalyticsService\x12Z\n\tUploadCSV\x12%.PredictionAnalytics.UploadCSVRequest\x1a&.PredictionAnalytics.UploadCSVResponse\x12j\n\x10GetSeasonalStats\x12,.PredictionAnalytics.GetSeasonalStatsRequest\x1a(.PredictionAnalytics.GetSeasonalResponse\x12u\n\x12GetPredictionStats\x12..PredictionAnalytics.GetPredictionStatsRequest\x1a/.PredictionAnalytics.GetPredictionStatsResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x14protos/service.proto\x12\x13PredictionAnalytics\"<\n\x10UploadCSVRequest\x12\x14\n\x0c\x66ile_content\x18\x01 \x01(\x0c\x12\x12\n\ndataset_id\x18\x02 \x01(\t\"4\n\x11UploadCSVResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x0f\n\x07message\x18\x02 \x01(\t\"D\n\x17GetSeasonalStatsRequest\x12\x15\n\rfacility_name\x18\x01 \x01(\t\x12\x12\n\ndataset_id\x18\x02 \x01(\t\"F\n\x19GetPredictionStatsRequest\x12\x15\n\rfacility_name\x18\x01 \x01(\t\x12\x12\n\ndataset_id\x18\x02 \x01(\t\"H\n\x1aStreamSeasonalStatsRequest\x12\x16\n\x0e\x66\x61\x63ility_names\x18\x01 \x03(\t\x12\x12\n\ndataset_id\x18\x02 \x01(\t\"^\n\x1cStreamPredictionStatsRequest\x12\x16\n\x0e\x66\x61\x63ility_names\x18\x01 \x03(\t\x12\x12\n\nchunk_size\x18\x02 \x01(\x05\x12\x12\n\ndataset_id\x18\x03 \x01(\t\"Y\n\tDataPoint\x12\x0e\n\x06season\x18\x01 \x01(\t\x12\x0e\n\x06\x63olumn\x18\x02 \x01(\t\x12\x0e\n\x06median\x18\x03 \x01(\x01\x12\r\n\x05lower\x18\x04 \x01(\x01\x12\r\n\x05upper\x18\x05 \x01(\x01\"\x89\x01\n\x0ePredictionData\x12!\n\x19predicted_capture_percent\x18\x01 \x01(\x01\x12!\n\x19predicted_storage_percent\x18\x02 \x01(\x01\x12\x1d\n\x15predicted_co2_emitted\x18\x03 \x01(\x01\x12\x12\n\ndate_range\x18\x04 \x01(\t\";\n\tChartData\x12.\n\x06points\x18\x01 \x03(\x0b\x32\x1e.PredictionAnalytics.DataPoint\"T\n\x13PredictionChartData\x12=\n\x10prediction_stats\x18\x01 \x03(\x0b\x32#.PredictionAnalytics.PredictionData\"I\n\x13GetSeasonalResponse\x12\x32\n\nchart_data\x18\x01 \x01(\x0b\x32\x1e.PredictionAnalytics.ChartData\"`\n\x1aGetPredictionStatsResponse\x12\x42\n\x10prediction_stats\x18\x01 \x01(\x0b\x32(.PredictionAnalytics.PredictionChartData\"_\n\x12SeasonalStatsChunk\x12\x15\n\rfacility_name\x18\x01 \x01(\t\x12\x32\n\nchart_data\x18\x02 \x01(\x0b\x32\x1e.PredictionAnalytics.ChartData\"q\n\x14PredictionStatsChunk\x12\x15\n\rfacility_name\x18\x01 \x01(\t\x12\x42\n\x10prediction_stats\x18\x02 \x01(\x0b\x32(.PredictionAnalytics.PredictionChartData\"\x92\x01\n\x14SeasonalStatsColumns\x12\x0f\n\x07seasons\x18\x01 \x03(\t\x12\x0f\n\x07\x63olumns\x18\x02 \x03(\t\x12\x14\n\x0cseason_index\x18\x03 \x03(\r\x12\x14\n\x0c\x63olumn_index\x18\x04 \x03(\r\x12\x0e\n\x06median\x18\x05 \x03(\x01\x12\r\n\x05lower\x18\x06 \x03(\x01\x12\r\n\x05upper\x18\x07 \x03(\x01\"\x90\x01\n\x16PredictionStatsColumns\x12\x11\n\tepoch_day\x18\x01 \x03(\x05\x12!\n\x19predicted_capture_percent\x18\x02 \x03(\x01\x12!\n\x19predicted_storage_percent\x18\x03 \x03(\x01\x12\x1d\n\x15predicted_co2_emitted\x18\x04 \x03(\x01\"m\n\x16PredictionColumnsChunk\x12\x15\n\rfacility_name\x18\x01 \x01(\t\x12<\n\x07\x63olumns\x18\x02 \x01(\x0b\x32+.PredictionAnalytics.PredictionStatsColumns2\xbb\x07\n\x1aPredictionAnalyticsService\x12Z\n\tUploadCSV\x12%.PredictionAnalytics.UploadCSVRequest\x1a&.PredictionAnalytics.UploadCSVResponse\x12j\n\x10GetSeasonalStats\x12,.PredictionAnalytics.GetSeasonalStatsRequest\x1a(.PredictionAnalytics.GetSeasonalResponse\x12u\n\x12GetPredictionStats\x12..PredictionAnalytics.GetPredictionStatsRequest\x1a/.PredictionAnalytics.GetPredictionStatsResponse\x12q\n\x13StreamSeasonalStats\x12/.PredictionAnalytics.StreamSeasonalStatsRequest\x1a\'.PredictionAnalytics.SeasonalStatsChunk0\x01\x12w\n\x15StreamPredictionStats\x12\x31.PredictionAnalytics.StreamPredictionStatsRequest\x1a).PredictionAnalytics.PredictionStatsChunk0\x01\x12s\n\x18GetSeasonalStatsColumnar\x12,.PredictionAnalytics.GetSeasonalStatsRequest\x1a).PredictionAnalytics.SeasonalStatsColumns\x12y\n\x1aGetPredictionStatsColumnar\x12..PredictionAnalytics.GetPredictionStatsRequest\x1a+.PredictionAnalytics.PredictionStatsColumns\x12\x81\x01\n\x1dStreamPredictionStatsColumnar\x12\x31.PredictionAnalytics.StreamPredictionStatsRequest\x1a+.PredictionAnalytics.PredictionColumnsChunk0\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -32,25 +32,39 @@ _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'protos.service_pb2', _globa
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
   _globals['_UPLOADCSVREQUEST']._serialized_start=45
-  _globals['_UPLOADCSVREQUEST']._serialized_end=85
-  _globals['_UPLOADCSVRESPONSE']._serialized_start=87
-  _globals['_UPLOADCSVRESPONSE']._serialized_end=139
-  _globals['_GETSEASONALSTATSREQUEST']._serialized_start=141
-  _globals['_GETSEASONALSTATSREQUEST']._serialized_end=189
-  _globals['_GETPREDICTIONSTATSREQUEST']._serialized_start=191
-  _globals['_GETPREDICTIONSTATSREQUEST']._serialized_end=241
-  _globals['_DATAPOINT']._serialized_start=243
-  _globals['_DATAPOINT']._serialized_end=332
-  _globals['_PREDICTIONDATA']._serialized_start=335
-  _globals['_PREDICTIONDATA']._serialized_end=472
-  _globals['_CHARTDATA']._serialized_start=474
-  _globals['_CHARTDATA']._serialized_end=533
-  _globals['_PREDICTIONCHARTDATA']._serialized_start=535
-  _globals['_PREDICTIONCHARTDATA']._serialized_end=619
-  _globals['_GETSEASONALRESPONSE']._serialized_start=621
-  _globals['_GETSEASONALRESPONSE']._serialized_end=694
-  _globals['_GETPREDICTIONSTATSRESPONSE']._serialized_start=696
-  _globals['_GETPREDICTIONSTATSRESPONSE']._serialized_end=792
-  _globals['_PREDICTIONANALYTICSSERVICE']._serialized_start=795
-  _globals['_PREDICTIONANALYTICSSERVICE']._serialized_end=1142
+  _globals['_UPLOADCSVREQUEST']._serialized_end=105
+  _globals['_UPLOADCSVRESPONSE']._serialized_start=107
+  _globals['_UPLOADCSVRESPONSE']._serialized_end=159
+  _globals['_GETSEASONALSTATSREQUEST']._serialized_start=161
+  _globals['_GETSEASONALSTATSREQUEST']._serialized_end=229
+  _globals['_GETPREDICTIONSTATSREQUEST']._serialized_start=231
+  _globals['_GETPREDICTIONSTATSREQUEST']._serialized_end=301
+  _globals['_STREAMSEASONALSTATSREQUEST']._serialized_start=303
+  _globals['_STREAMSEASONALSTATSREQUEST']._serialized_end=375
+  _globals['_STREAMPREDICTIONSTATSREQUEST']._serialized_start=377
+  _globals['_STREAMPREDICTIONSTATSREQUEST']._serialized_end=471
+  _globals['_DATAPOINT']._serialized_start=473
+  _globals['_DATAPOINT']._serialized_end=562
+  _globals['_PREDICTIONDATA']._serialized_start=565
+  _globals['_PREDICTIONDATA']._serialized_end=702
+  _globals['_CHARTDATA']._serialized_start=704
+  _globals['_CHARTDATA']._serialized_end=763
+  _globals['_PREDICTIONCHARTDATA']._serialized_start=765
+  _globals['_PREDICTIONCHARTDATA']._serialized_end=849
+  _globals['_GETSEASONALRESPONSE']._serialized_start=851
+  _globals['_GETSEASONALRESPONSE']._serialized_end=924
+  _globals['_GETPREDICTIONSTATSRESPONSE']._serialized_start=926
+  _globals['_GETPREDICTIONSTATSRESPONSE']._serialized_end=1022
+  _globals['_SEASONALSTATSCHUNK']._serialized_start=1024
+  _globals['_SEASONALSTATSCHUNK']._serialized_end=1119
+  _globals['_PREDICTIONSTATSCHUNK']._serialized_start=1121
+  _globals['_PREDICTIONSTATSCHUNK']._serialized_end=1234
+  _globals['_SEASONALSTATSCOLUMNS']._serialized_start=1237
+  _globals['_SEASONALSTATSCOLUMNS']._serialized_end=1383
+  _globals['_PREDICTIONSTATSCOLUMNS']._serialized_start=1386
+  _globals['_PREDICTIONSTATSCOLUMNS']._serialized_end=1530
+  _globals['_PREDICTIONCOLUMNSCHUNK']._serialized_start=1532
+  _globals['_PREDICTIONCOLUMNSCHUNK']._serialized_end=1641
+  _globals['_PREDICTIONANALYTICSSERVICE']._serialized_start=1644
+  _globals['_PREDICTIONANALYTICSSERVICE']._serialized_end=2599
 # @@protoc_insertion_point(module_scope)
@@ -49,6 +49,31 @@ class PredictionAnalyticsServiceStub(object):
                 request_serializer=protos_dot_service__pb2.GetPredictionStatsRequest.SerializeToString,
                 response_deserializer=protos_dot_service__pb2.GetPredictionStatsResponse.FromString,
                 _registered_method=True)
+        self.StreamSeasonalStats = channel.unary_stream(
+                '/PredictionAnalytics.PredictionAnalyticsService/StreamSeasonalStats',
+                request_serializer=protos_dot_service__pb2.StreamSeasonalStatsRequest.SerializeToString,
+                response_deserializer=protos_dot_service__pb2.SeasonalStatsChunk.FromString,
+                _registered_method=True)
+        self.StreamPredictionStats = channel.unary_stream(
+                '/PredictionAnalytics.PredictionAnalyticsService/StreamPredictionStats',
+                request_serializer=protos_dot_service__pb2.StreamPredictionStatsRequest.SerializeToString,
+                response_deserializer=protos_dot_service__pb2.PredictionStatsChunk.FromString,
+                _registered_method=True)
+        self.GetSeasonalStatsColumnar = channel.unary_unary(
+                '/PredictionAnalytics.PredictionAnalyticsService/GetSeasonalStatsColumnar',
+                request_serializer=protos_dot_service__pb2.GetSeasonalStatsRequest.SerializeToString,
+                response_deserializer=protos_dot_service__pb2.SeasonalStatsColumns.FromString,
+                _registered_method=True)
+        self.GetPredictionStatsColumnar = channel.unary_unary(
+                '/PredictionAnalytics.PredictionAnalyticsService/GetPredictionStatsColumnar',
+                request_serializer=protos_dot_service__pb2.GetPredictionStatsRequest.SerializeToString,
+                response_deserializer=protos_dot_service__pb2.PredictionStatsColumns.FromString,
+                _registered_method=True)
+        self.StreamPredictionStatsColumnar = channel.unary_stream(
+                '/PredictionAnalytics.PredictionAnalyticsService/StreamPredictionStatsColumnar',
+                request_serializer=protos_dot_service__pb2.StreamPredictionStatsRequest.SerializeToString,
+                response_deserializer=protos_dot_service__pb2.PredictionColumnsChunk.FromString,
+                _registered_method=True)
 
 
 class PredictionAnalyticsServiceServicer(object):
@@ -72,6 +97,36 @@ class PredictionAnalyticsServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def StreamSeasonalStats(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def StreamPredictionStats(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetSeasonalStatsColumnar(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetPredictionStatsColumnar(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def StreamPredictionStatsColumnar(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_PredictionAnalyticsServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -90,6 +145,31 @@ def add_PredictionAnalyticsServiceServicer_to_server(servicer, server):
                     request_deserializer=protos_dot_service__pb2.GetPredictionStatsRequest.FromString,
                     response_serializer=protos_dot_service__pb2.GetPredictionStatsResponse.SerializeToString,
             ),
+            'StreamSeasonalStats': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamSeasonalStats,
+                    request_deserializer=protos_dot_service__pb2.StreamSeasonalStatsRequest.FromString,
+                    response_serializer=protos_dot_service__pb2.SeasonalStatsChunk.SerializeToString,
+            ),
+            'StreamPredictionStats': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamPredictionStats,
+                    request_deserializer=protos_dot_service__pb2.StreamPredictionStatsRequest.FromString,
+                    response_serializer=protos_dot_service__pb2.PredictionStatsChunk.SerializeToString,
+            ),
+            'GetSeasonalStatsColumnar': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetSeasonalStatsColumnar,
+                    request_deserializer=protos_dot_service__pb2.GetSeasonalStatsRequest.FromString,
+                    response_serializer=protos_dot_service__pb2.SeasonalStatsColumns.SerializeToString,
+            ),
+            'GetPredictionStatsColumnar': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetPredictionStatsColumnar,
+                    request_deserializer=protos_dot_service__pb2.GetPredictionStatsRequest.FromString,
+                    response_serializer=protos_dot_service__pb2.PredictionStatsColumns.SerializeToString,
+            ),
+            'StreamPredictionStatsColumnar': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamPredictionStatsColumnar,
+                    request_deserializer=protos_dot_service__pb2.StreamPredictionStatsRequest.FromString,
+                    response_serializer=protos_dot_service__pb2.PredictionColumnsChunk.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'PredictionAnalytics.PredictionAnalyticsService', rpc_method_handlers)
@@ -181,3 +261,138 @@ class PredictionAnalyticsService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def StreamSeasonalStats(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/PredictionAnalytics.PredictionAnalyticsService/StreamSeasonalStats',
+            protos_dot_service__pb2.StreamSeasonalStatsRequest.SerializeToString,
+            protos_dot_service__pb2.SeasonalStatsChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def StreamPredictionStats(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/PredictionAnalytics.PredictionAnalyticsService/StreamPredictionStats',
+            protos_dot_service__pb2.StreamPredictionStatsRequest.SerializeToString,
+            protos_dot_service__pb2.PredictionStatsChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetSeasonalStatsColumnar(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/PredictionAnalytics.PredictionAnalyticsService/GetSeasonalStatsColumnar',
+            protos_dot_service__pb2.GetSeasonalStatsRequest.SerializeToString,
+            protos_dot_service__pb2.SeasonalStatsColumns.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetPredictionStatsColumnar(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/PredictionAnalytics.PredictionAnalyticsService/GetPredictionStatsColumnar',
+            protos_dot_service__pb2.GetPredictionStatsRequest.SerializeToString,
+            protos_dot_service__pb2.PredictionStatsColumns.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def StreamPredictionStatsColumnar(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/PredictionAnalytics.PredictionAnalyticsService/StreamPredictionStatsColumnar',
+            protos_dot_service__pb2.StreamPredictionStatsRequest.SerializeToString,
+            protos_dot_service__pb2.PredictionColumnsChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -0,0 +1,149 @@
+# Background re-scoring of historical anomaly flags
+# -------------------------------
+# The anomaly_flag column only reflects the model as it was when each row came in through /update_csv/, and rows
+# from /upload_csv/ are never scored. A rescore job recomputes the flags for a whole dataset, one facility or a
+# date range with CO2_anomaly_flags (insights.py), one vectorised pass per facility on the fit pool.
+#
+# Jobs run on a background thread and report progress as facilities finish. When every facility is done the new
+# flags are published in one go as a new version of the dataset (DatasetWorkspace.publish_column), so readers
+# never see a half re-scored dataset. Rows ingested while the job was running keep the flags they got at ingest.
+# Finished jobs can be polled for JOB_TTL_S seconds, after that they are forgotten.
+
+import threading
+import time
+import uuid
+from collections import deque
+
+import pandas as pd
+
+from fit_pool import FitPoolSaturated
+from insights import ANOMALY_THRESHOLD
+
+JOB_TTL_S = 3600 # how long a finished job stays around for GET /rescore/{job_id}
+
+jobs = {}
+jobs_lock = threading.Lock()
+
+
+class RescoreJob:
+
+    def __init__(self, dataset, facility_name=None, start=None, end=None, threshold=ANOMALY_THRESHOLD):
+        self.id            = uuid.uuid4().hex
+        self.dataset       = dataset
+        self.facility_name = facility_name
+        self.start         = start
+        self.end           = end
+        self.threshold     = threshold
+
+        self.status           = "queued" # queued -> running -> done / failed
+        self.facilities_total = 0
+        self.facilities_done  = 0
+        self.rows_scored      = 0
+        self.rows_flagged     = 0
+        self.rows_changed     = 0
+        self.version          = None     # dataset version the results were published as
+        self.error            = None
+        self.created_at       = time.time()
+        self.finished_at      = None
+
+    def progress(self):
+        return {
+            "job_id":           self.id,
+            "status":           self.status,
+            "dataset":          self.dataset,
+            "facility_name":    self.facility_name,
+            "start":            self.start,
+            "end":              self.end,
+            "threshold":        self.threshold,
+            "facilities_total": self.facilities_total,
+            "facilities_done":  self.facilities_done,
+            "progress":         self.facilities_done / self.facilities_total if self.facilities_total else 0.0,
+            "rows_scored":      self.rows_scored,
+            "rows_flagged":     self.rows_flagged,
+            "rows_changed":     self.rows_changed,
+            "version":          self.version,
+            "error":            self.error,
+        }
+
+
+def start_rescore(workspace, fit_pool, dataset=None, facility_name=None, start=None, end=None, threshold=ANOMALY_THRESHOLD):
+    """Start a rescore job on a background thread and return it right away."""
+    if threshold <= 0:
+        raise ValueError("threshold must be above 0")
+    for bound in (start, end):
+        if bound is not None:
+            pd.Timestamp(bound) # raises ValueError for dates we could not filter on
+
+    job = RescoreJob(dataset or "default", facility_name, start, end, threshold)
+    with jobs_lock:
+        expire_jobs()
+        jobs[job.id] = job
+    threading.Thread(target=run_rescore, args=(job, workspace, fit_pool), name=f"rescore-{job.id}", daemon=True).start()
+    return job
+
+
+def get_job(job_id):
+    with jobs_lock:
+        expire_jobs()
+        return jobs.get(job_id)
+
+
+def expire_jobs():
+    # Called with jobs_lock held. Running jobs are never dropped
+    cutoff = time.time() - JOB_TTL_S
+    for job_id in [job_id for job_id, job in jobs.items() if job.finished_at is not None and job.finished_at < cutoff]:
+        del jobs[job_id]
+
+
+def run_rescore(job, workspace, fit_pool):
+    job.status = "running"
+    try:
+        data, version, generation = workspace.snapshot(job.dataset)
+        facilities = data["facility_name"].dropna().unique().tolist()
+        if job.facility_name:
+            if job.facility_name not in facilities:
+                raise ValueError(f"No data for {job.facility_name} in dataset {job.dataset!r}")
+            facilities = [job.facility_name]
+        job.facilities_total = len(facilities)
+        options = {"threshold": job.threshold, "start": job.start, "end": job.end}
+
+        # One facility per pool worker at a time, so the job does not crowd out request fits
+        flags = []
+        waiting = deque(facilities)
+        pending = deque()
+        while waiting or pending:
+            while waiting and len(pending) < fit_pool.max_workers:
+                try:
+                    pending.append(fit_pool.submit("anomaly", data, waiting[0], version, block_s=1, **options))
+                    waiting.popleft()
+                except FitPoolSaturated:
+                    if pending:
+                        break # collect one of ours first
+
+            facility_flags = pending.popleft().result()
+            flags.append(facility_flags)
+            job.facilities_done += 1
+            job.rows_scored += len(facility_flags)
+            job.rows_flagged += int(facility_flags.sum())
+
+        new_flags = pd.concat(flags) if flags else pd.Series(dtype=bool)
+        job.rows_changed = count_changed(data, new_flags)
+
+        _, job.version = workspace.publish_column(job.dataset, "anomaly_flag", new_flags, generation)
+        job.status = "done"
+        print(f"Rescore {job.id}: {job.rows_flagged} of {job.rows_scored} rows flagged, {job.rows_changed} changed, published as version {job.version}")
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+        print(f"Rescore {job.id} failed: {e}")
+    finally:
+        job.finished_at = time.time()
+
+
+def count_changed(data, new_flags):
+    if "anomaly_flag" not in data.columns:
+        return len(new_flags)
+    old_flags = data.loc[new_flags.index, "anomaly_flag"]
+    if old_flags.dtype == object: # flags that came in as text, e.g. "TRUE" / "False"
+        old_flags = old_flags.astype(str).str.strip().str.lower().map({"true": True, "false": False})
+    return int((old_flags.astype("boolean") != new_flags.astype("boolean")).fillna(True).sum())
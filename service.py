@@ -11,7 +11,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime, timezone, timedelta
 
 # Import the analytics function from the local insights.py file
-from insights import CO2_emssion_pattern, CO2_stats, seasonal_emission_forecasts
+from insights import CO2_stats, seasonal_emission_forecasts, ANOMALY_THRESHOLD
+from fit_pool import FitPool, FitPoolSaturated
+from workspace import DatasetWorkspace, DatasetNotFound
+import rescore
 
 app = FastAPI(title="Prediction service")
 app.add_middleware(
@@ -26,9 +29,44 @@ app.add_middleware(
 
 
 
-#Initialize the csv as nothing___________
-data = pd.DataFrame()
-csv_path = None
+# Named datasets, each with its own csv and append log (see workspace.py)___________
+WORKSPACE_BUDGET_BYTES = 1024**3 # parsed datasets kept in memory, least recently used ones get evicted past this
+APPEND_FLUSH_ROWS = 256          # ingested rows are committed in groups of this many rows...
+APPEND_FLUSH_MS   = 5            # ...or once the oldest buffered row is this old
+APPEND_FSYNC      = "always"     # "always", "interval" or "never"
+
+workspace = DatasetWorkspace(
+    budget_bytes=WORKSPACE_BUDGET_BYTES,
+    flush_rows=APPEND_FLUSH_ROWS, flush_ms=APPEND_FLUSH_MS, fsync=APPEND_FSYNC,
+)
+
+# The workspace takes a per-dataset lock that uploads and rescore publishes hold for a whole csv rewrite, and a
+# cache miss reparses the csv, so every workspace call goes through a thread instead of blocking the event loop
+async def get_dataset(dataset):
+    try:
+        return await asyncio.to_thread(workspace.get, dataset)
+    except (ValueError, DatasetNotFound) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.on_event("shutdown")
+def shutdown_workspace():
+    workspace.close() # commits and compacts every pending append log
+#___________________________
+
+
+# Model fits run on a process pool, identical in-flight fits are shared (see fit_pool.py)___________
+fit_pool = FitPool(max_workers=os.cpu_count())
+
+async def run_fit(model_name, data, version, facility_name, **options):
+    try:
+        future = fit_pool.submit(model_name, data, facility_name, version, **options) # never blocks the event loop
+    except FitPoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    return await asyncio.wrap_future(future)
+
+@app.on_event("shutdown")
+def shutdown_fit_pool():
+    fit_pool.shutdown()
 #___________________________
 
 
@@ -51,35 +89,25 @@ class GlobalInput(BaseModel):
 
 # endpoint to upload from frontend____________
 @app.post("/upload_csv/")
-async def upload_csv(file: UploadFile = File(...)):
-    global csv_path, data
-     
-    timestamp = datetime.now().astimezone().strftime("%Y-%m-%d_%H-%M-%S_%Z")
-    csv_path = f"./dataset_file.csv" #save file to local dir and make sure that only obe file is there at a time
-    with open(csv_path, "wb") as f:
-        f.write(await file.read())
-
-    data = pd.read_csv(csv_path) #data is now the uploaded csv
+async def upload_csv(file: UploadFile = File(...), dataset: str | None = None):
+    # csv, gzip/zstd compressed csv, Parquet or Arrow IPC, see upload_formats.py. The upload is read from the spooled file, not loaded into memory first
+    try:
+        csv_path, fmt = await asyncio.to_thread(workspace.put, dataset, file.file) #each dataset has one file, uploading again replaces it
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     """
     if "anomaly_flag" not in data.columns: #check if the anomaly_flag field even exists
         data["anomaly_flag"] = False
         data.to_csv(csv_path, index=False)
     """
-    return {"status": "success", "message": f"Your csv has been uploaded, and saved to {csv_path}"}
+    return {"status": "success", "message": f"Your {fmt} file has been uploaded, and saved to {csv_path}"}
 #___________________________
 
 
-
-def use_csv():
-    global csv_path, data
-    csv_path = fr".\dataset_file.csv"
-    if os.path.exists(csv_path):
-
-        data = pd.read_csv(csv_path)
-        return {f"CSV data set to local path on server: {csv_path}"}
-    else:
-        return {"error": "CSV not found on server. Please check the file name."}
-
+# endpoint to list the datasets on the server and which ones are parsed in memory___________
+@app.get("/datasets/")
+async def list_datasets():
+    return await asyncio.to_thread(workspace.info)
 #__________________________________
 
 
@@ -89,17 +117,15 @@ def use_csv():
     will try to find a better way to do this.
     """
 @app.get("/get_csv/")
-async def get_csv(csv_name: str):
-    global csv_path, data
-    
-    csv_path = fr".\{csv_name}" 
-    if os.path.exists(csv_path):
-
-        data = pd.read_csv(csv_path)
-        data = data.fillna("") 
-        return data.to_dict(orient="records")
+async def get_csv(csv_name: str | None = None, dataset: str | None = None):
+    if csv_name is not None: # read a csv that is already on the server, without touching any dataset
+        csv_path = fr".\{csv_name}"
+        if not os.path.exists(csv_path):
+            return {"error": "CSV not found on server. Please check the file name."}
+        data = await asyncio.to_thread(pd.read_csv, csv_path)
     else:
-        return {"error": "CSV not found on server. Please check the file name."}
+        data, _ = await get_dataset(dataset)
+    return data.fillna("").to_dict(orient="records")
 
 #__________________________________
 
@@ -107,23 +133,26 @@ async def get_csv(csv_name: str):
 #For streaming graphs___________________
 fronts = []
 @app.get("/graph_stream/")
-async def graph_stream(facility_name: str):
+async def graph_stream(facility_name: str, dataset: str | None = None):
     async def event_generator():
         queue = asyncio.Queue()
-        fronts.append((queue, facility_name))
+        front = (queue, facility_name, dataset or "default")
+        fronts.append(front)
 
         try:
             while True:
                 graph_base64 = await queue.get()
                 yield f"data: {graph_base64}\n\n"
         finally:
-            fronts.remove((queue, facility_name))
+            fronts.remove(front)
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
-async def graph_update():
-    for queue, facility in fronts:
-        graph = CO2_stats(data, facility)
+async def graph_update(dataset, data):
+    for queue, facility, front_dataset in fronts:
+        if front_dataset != dataset:
+            continue
+        graph, _ = CO2_stats(data, facility)
         buf = BytesIO()
         graph.savefig(buf, format="png")
         buf.seek(0)
@@ -134,10 +163,8 @@ async def graph_update():
 
 #To update the csv___________________________
 @app.post("/update_csv/")
-async def update_csv(entry: GlobalInput):
-    global data, csv_path
-    if csv_path is None:
-        raise HTTPException(status_code=400, detail="CSV path not set. Use /set_csv/ before anything.")
+async def update_csv(entry: GlobalInput, dataset: str | None = None):
+    data, version = await get_dataset(dataset)
 
     entry_dict = entry.dict()
 
@@ -145,25 +172,26 @@ async def update_csv(entry: GlobalInput):
     anomaly_flag = any(value is None for value in entry_dict.values()) # flag missing values beforehand
 
     
-    model, _, _ = CO2_emssion_pattern(data, entry_dict["facility_name"], plot=False, scatter=False) # Train the model for facility
+    model, _, _ = await run_fit("ridge", data, version, entry_dict["facility_name"], plot=False, scatter=False) # Train the model for facility
 
     predicted = None
     if model is not None:
         predicted = model.predict([[entry_dict["co2_emitted_tonnes"]]])[0]
         
-        if entry_dict["capture_efficiency_percent"] <= 0.9 * predicted: # Permissable range
+        if entry_dict["capture_efficiency_percent"] <= ANOMALY_THRESHOLD * predicted: # Permissable range
             anomaly_flag = True
 
     entry_dict["anomaly_flag"] = anomaly_flag
 
     new_entry = pd.DataFrame([entry_dict])
-    data = pd.concat([data, new_entry], ignore_index=True)
-    new_entry.to_csv(csv_path, mode="a", header=False, index=False)
+    committed = await asyncio.to_thread(workspace.append, dataset, new_entry)
+    await asyncio.wrap_future(committed) # acknowledged only once the row is committed
 
-    await graph_update()
+    data, (dataset, _) = await get_dataset(dataset)
+    await graph_update(dataset, data)
     return {
         "status": "success",
-        "message": f"Data added to {csv_path}",
+        "message": f"Data added to {workspace.path(dataset)}",
         "anomaly_flag": anomaly_flag,
         "predicted_efficiency": predicted
     }
@@ -172,11 +200,9 @@ async def update_csv(entry: GlobalInput):
 
 # endpoint for live tracking with every csv update___________
 @app.get("/get_graph/")
-async def efficiency_tracking_graph(facility_name: str, nums: bool = False):
-    global csv_path, data
-    if csv_path is None:
-        raise HTTPException(status_code=400, detail="CSV path not set. Use /set_csv/ before anything.")
-    
+async def efficiency_tracking_graph(facility_name: str, nums: bool = False, dataset: str | None = None):
+    data, _ = await get_dataset(dataset)
+
     graph, numbers = CO2_stats(data, facility_name)
     if graph is None:
         raise HTTPException(status_code=404, detail=f"No data for {facility_name}.")
@@ -195,13 +221,10 @@ async def efficiency_tracking_graph(facility_name: str, nums: bool = False):
 
 #for seasonal stats
 @app.get("/get_seasonal_stats/")
-async def get_seasonal_stats(facility_name: str):
+async def get_seasonal_stats(facility_name: str, dataset: str | None = None):
     #need to research on what else can affect the prediction
-    global csv_path, data
-    use_csv()
-    if csv_path is None:
-        raise HTTPException(status_code=400, detail="CSV path not set. Use /set_csv/ before anything.")
-    
+    data, _ = await get_dataset(dataset)
+
     stats, graph = seasonal_emission_forecasts(data, facility_name)
     if graph is None:
         raise HTTPException(status_code=404, detail=f"No data for {facility_name}.")
@@ -214,3 +237,22 @@ async def get_seasonal_stats(facility_name: str):
     return stats
 #_________________________________
 
+
+# Re-score the anomaly flags of a dataset in the background (see rescore.py)___________
+@app.post("/rescore/")
+async def rescore_dataset(dataset: str | None = None, facility_name: str | None = None,
+                          start: str | None = None, end: str | None = None, threshold: float = ANOMALY_THRESHOLD):
+    await get_dataset(dataset) # 400 right away for a dataset that does not exist
+    try:
+        job = rescore.start_rescore(workspace, fit_pool, dataset, facility_name, start, end, threshold)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job.progress()
+
+@app.get("/rescore/{job_id}")
+async def rescore_progress(job_id: str):
+    job = rescore.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No rescore job {job_id}.")
+    return job.progress()
+#_________________________________
@@ -0,0 +1,94 @@
+# Upload formats accepted by /upload_csv/ and UploadCSV
+# -------------------------------
+# Besides plain csv, uploads can be gzip or zstd compressed csv, Parquet, or Arrow IPC (file or stream format).
+# The format is detected from the first bytes, the file name does not matter.
+#
+# Compressed csv is decompressed chunk by chunk straight into the dataset's csv file, so a large upload is never
+# held in memory fully decompressed. Parquet and Arrow are read column-wise by pyarrow and written out as csv,
+# because the dataset's csv is what the append log adds rows to.
+#
+# zstandard and pyarrow are only needed for their formats and are imported when such an upload comes in.
+
+import gzip
+import shutil
+
+import pandas as pd
+
+CHUNK_SIZE = 1024 * 1024 # bytes per read while decompressing
+
+MAGIC = [ # (leading bytes, format)
+    (b"\x1f\x8b",         "gzip"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+    (b"PAR1",             "parquet"),
+    (b"ARROW1",           "arrow"),
+    (b"\xff\xff\xff\xff", "arrow_stream"), # continuation marker that starts every IPC stream message
+]
+
+
+def detect_format(stream):
+    head = stream.read(8)
+    stream.seek(0)
+    for magic, fmt in MAGIC:
+        if head.startswith(magic):
+            return fmt
+    return "csv"
+
+
+def save_upload(stream, csv_path):
+    """Write the upload in `stream` (a seekable binary file object) to `csv_path` as csv. Returns the parsed DataFrame and the detected format."""
+    fmt = detect_format(stream)
+
+    if fmt in ("csv", "gzip", "zstd"):
+        try:
+            with open(csv_path, "wb") as out:
+                shutil.copyfileobj(decompressed(stream, fmt), out, CHUNK_SIZE)
+        except Exception as e:
+            if fmt == "csv":
+                raise
+            raise ValueError(f"Could not decompress the {fmt} upload: {e}") from e
+        return pd.read_csv(csv_path), fmt
+
+    frame = read_columnar(stream, fmt)
+    if "date" in frame.columns and pd.api.types.is_datetime64_any_dtype(frame["date"]):
+        frame["date"] = csv_dates(frame["date"])
+    frame.to_csv(csv_path, index=False)
+    return frame, fmt
+
+
+def csv_dates(dates):
+    """Dates as text the way dataset_file.csv writes them (month first, no zero padding, e.g. 1/31/2024), so a
+    columnar upload parses to the same dates as the csv it was made from."""
+    text = dates.dt.month.astype("Int64").astype(str) + "/" + dates.dt.day.astype("Int64").astype(str) + "/" + dates.dt.year.astype("Int64").astype(str)
+    return text.where(dates.notna(), None)
+
+
+def decompressed(stream, fmt):
+    if fmt == "gzip":
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    if fmt == "zstd":
+        zstandard = optional_import("zstandard", fmt)
+        return zstandard.ZstdDecompressor().stream_reader(stream, read_size=CHUNK_SIZE)
+    return stream
+
+
+def read_columnar(stream, fmt):
+    pa = optional_import("pyarrow", fmt)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        table = pq.read_table(stream)
+    elif fmt == "arrow":
+        table = pa.ipc.open_file(stream).read_all()
+    else:
+        table = pa.ipc.open_stream(stream).read_all()
+    date_columns = [name for name, type in zip(table.column_names, table.schema.types) if pa.types.is_date(type)]
+    frame = table.to_pandas()
+    for column in date_columns: # arrow dates come back as python date objects
+        frame[column] = pd.to_datetime(frame[column])
+    return frame
+
+
+def optional_import(module, fmt):
+    try:
+        return __import__(module)
+    except ImportError:
+        raise ValueError(f"{fmt} uploads need the {module} package, install it with `pip install {module}`")
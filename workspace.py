@@ -0,0 +1,301 @@
+# Named datasets with their own storage, kept parsed in memory under a byte budget
+# -------------------------------
+# Every dataset is a csv on disk plus its own append log (see append_log.py). The "default" dataset is
+# ./dataset_file.csv, so clients that never pass a dataset name behave as before; any other name lives in
+# ./datasets/<name>.csv.
+#
+# Parsed DataFrames are kept resident in LRU order. Once the resident frames add up to more than
+# `budget_bytes`, the least recently used ones are dropped from memory (never from disk) and get reparsed
+# on their next use. The dataset that was just used is always kept, even if it alone is over budget.
+#
+# Each dataset has a version that goes up every time its rows change. (name, version) is what the fit pool
+# uses to decide whether two fits are the same. The generation only goes up when the whole dataset is replaced
+# by an upload, or when rows that were already served from memory fail to commit, so background jobs can tell
+# "rows were appended" apart from "this is not the dataset I read anymore".
+#
+# The other server process (or another workspace) can write the same csv files. Every get() compares the csv's stat
+# stamp with the one it had when it was parsed, skipping changes made by our own append log, and reparses the
+# dataset under a new version when someone else changed it. A csv replaced under us also gets a new generation.
+
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import partial
+
+import pandas as pd
+
+from append_log import AppendLog, discard_leftovers, file_stamp, fsync_dir, recover
+from upload_formats import save_upload
+
+DEFAULT_DATASET = "default"
+DATASET_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,127}")
+
+
+class DatasetNotFound(Exception):
+    pass
+
+
+class DatasetChanged(Exception):
+    pass
+
+
+class Dataset:
+
+    def __init__(self, name, path):
+        self.name       = name
+        self.path       = path
+        self.frame      = None  # parsed rows while resident, None once evicted
+        self.nbytes     = 0
+        self.version    = 0
+        self.generation = 0     # bumped when the csv is replaced by an upload
+        self.stamp      = None  # file_stamp() of the csv the frame was parsed from or written to
+        self.recovered  = False # crash leftovers of the append log replayed (or discarded) since we started
+        self.dirty      = False # the resident frame holds rows that failed to commit, reparse before serving it
+        self.log        = None  # AppendLog, opened on the first append
+        self.lock       = threading.RLock()
+
+
+class DatasetWorkspace:
+
+    def __init__(self, root="./datasets", default_path="./dataset_file.csv", budget_bytes=1024**3, **log_options):
+        self.root         = root
+        self.default_path = default_path
+        self.budget_bytes = budget_bytes
+        self.log_options  = log_options  # passed on to every AppendLog
+
+        self._lock     = threading.Lock()  # guards the two dicts below
+        self._datasets = {}
+        self._resident = OrderedDict()     # name -> Dataset, least recently used first
+
+
+    # Public API___________________________
+    def get(self, name=None):
+        """The dataset's rows and version. Parses the csv if the dataset is not resident."""
+        dataset = self._dataset(name)
+        with dataset.lock:
+            frame = self._load(dataset)
+            return frame, (dataset.name, dataset.version)
+
+    def snapshot(self, name=None):
+        """Like get(), plus the generation to hand back to publish_column() later."""
+        dataset = self._dataset(name)
+        with dataset.lock:
+            frame = self._load(dataset)
+            return frame, (dataset.name, dataset.version), dataset.generation
+
+    def put(self, name, stream):
+        """Replace the dataset with the upload in `stream`, any format upload_formats.py knows. Returns the csv path and the format."""
+        dataset = self._dataset(name)
+        with dataset.lock:
+            self._close_log(dataset) # pending rows belong to the file we are about to replace
+            discard_leftovers(dataset.path, self._fsync_policy()) # and so do segments a crash left behind
+            dataset.recovered = True
+            os.makedirs(os.path.dirname(os.path.abspath(dataset.path)), exist_ok=True)
+            tmp_path = temp_path(dataset.path)
+            try:
+                frame, fmt = save_upload(stream, tmp_path)
+                replace_durably(tmp_path, dataset.path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._stamp(dataset)
+            dataset.version += 1
+            dataset.generation += 1
+            self._admit(dataset, frame)
+            return dataset.path, fmt
+
+    def publish_column(self, name, column, values, generation):
+        """Atomically write `values` (a Series indexed by row) into `column` as a new version of the dataset.
+
+        Rows appended since the snapshot the values were computed from are kept as they are. Raises DatasetChanged
+        if the dataset was replaced in the meantime. Returns the new (name, version).
+        """
+        dataset = self._dataset(name)
+        with dataset.lock:
+            frame = self._load(dataset).copy()
+            if dataset.log is not None: # every acknowledged row has to be in the file we are about to replace
+                dataset.log.flush()
+                dataset.log.compact()
+            if dataset.generation != generation or dataset.dirty:
+                raise DatasetChanged(f"Dataset {dataset.name!r} was replaced, or lost rows that failed to commit, while the job was running")
+
+            if column not in frame.columns:
+                frame[column] = pd.NA
+            frame.loc[values.index, column] = values
+
+            tmp_path = temp_path(dataset.path)
+            try:
+                frame.to_csv(tmp_path, index=False)
+                replace_durably(tmp_path, dataset.path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._stamp(dataset)
+            dataset.version += 1
+            self._admit(dataset, frame)
+            return dataset.name, dataset.version
+
+    def append(self, name, rows):
+        """Add rows to a dataset. Returns a Future, resolved once the rows are committed.
+
+        The rows are served from memory right away. If the commit fails they are dropped again: the dataset is
+        reparsed from disk on its next read, and its generation goes up.
+        """
+        dataset = self._dataset(name)
+        with dataset.lock:
+            frame = self._load(dataset)
+            if dataset.log is None:
+                dataset.log = AppendLog(dataset.path, **self.log_options)
+                frame = self._load(dataset) # recovery may have merged rows left over from a crash into the csv
+            logged = dataset.log.append(rows)
+            dataset.version += 1
+            self._admit(dataset, pd.concat([frame, rows], ignore_index=True), added_bytes=int(rows.memory_usage(deep=True).sum()))
+            committed = Future()
+            logged.add_done_callback(partial(self._committed, dataset, committed))
+            return committed
+
+    def exists(self, name=None):
+        dataset = self._dataset(name)
+        return dataset.frame is not None or os.path.exists(dataset.path)
+
+    def path(self, name=None):
+        return self._dataset(name).path
+
+    def names(self):
+        names = set(self._datasets)
+        if os.path.exists(self.default_path):
+            names.add(DEFAULT_DATASET)
+        if os.path.isdir(self.root):
+            names.update(file[:-len(".csv")] for file in os.listdir(self.root) if file.endswith(".csv"))
+        return sorted(name for name in names if self.exists(name))
+
+    def info(self):
+        with self._lock:
+            resident = {name: dataset.nbytes for name, dataset in self._resident.items()}
+        return {
+            "budget_bytes":   self.budget_bytes,
+            "resident_bytes": sum(resident.values()),
+            "datasets": [
+                {"name": name, "resident": name in resident, "bytes": resident.get(name, 0)}
+                for name in self.names()
+            ],
+        }
+
+    def close(self):
+        with self._lock:
+            datasets = list(self._datasets.values())
+        for dataset in datasets:
+            with dataset.lock:
+                self._close_log(dataset)
+    #___________________________
+
+
+    def _dataset(self, name):
+        name = name or DEFAULT_DATASET
+        if not DATASET_NAME.fullmatch(name):
+            raise ValueError(f"Invalid dataset name {name!r}: use letters, digits, '.', '_' or '-'")
+        with self._lock:
+            dataset = self._datasets.get(name)
+            if dataset is None:
+                path = self.default_path if name == DEFAULT_DATASET else os.path.join(self.root, f"{name}.csv")
+                dataset = self._datasets[name] = Dataset(name, path)
+            return dataset
+
+    def _load(self, dataset):
+        frame = dataset.frame
+        if frame is not None:
+            if self._fresh(dataset):
+                with self._lock:
+                    if dataset.name in self._resident:
+                        self._resident.move_to_end(dataset.name)
+                return frame
+            print(f"Dataset {dataset.name!r} {'has rows that failed to commit' if dataset.dirty else 'changed on disk'}, reparsing it")
+            dataset.version += 1
+            dataset.dirty = False # whatever fails from here on marks it again
+
+        if dataset.log is not None: # make sure every row we acknowledged is in the csv before reparsing it
+            dataset.log.flush()
+            dataset.log.compact()
+        elif not dataset.recovered: # rows acknowledged before a crash may still be sitting in log segments
+            recover(dataset.path, self._fsync_policy())
+            dataset.recovered = True
+        if not os.path.exists(dataset.path):
+            raise DatasetNotFound(f"Dataset {dataset.name!r} not found. Upload it with /upload_csv/ first.")
+        previous = dataset.stamp
+        self._stamp(dataset) # before parsing: a write that lands while we parse shows up as a change next time
+        if previous is not None and dataset.stamp is not None and previous[0] != dataset.stamp[0]:
+            dataset.generation += 1 # replaced, not appended to
+        frame = pd.read_csv(dataset.path)
+        self._admit(dataset, frame)
+        return frame
+
+    def _fresh(self, dataset):
+        """Whether the csv is still what the resident frame was parsed from, give or take our own compactions."""
+        if dataset.dirty:
+            return False
+        if dataset.log is not None:
+            for before, after in dataset.log.take_merges():
+                if before == dataset.stamp:
+                    dataset.stamp = after
+        return file_stamp(dataset.path) == dataset.stamp
+
+    def _stamp(self, dataset):
+        if dataset.log is not None:
+            dataset.log.take_merges() # already part of the file we are stamping
+        dataset.stamp = file_stamp(dataset.path)
+
+    def _admit(self, dataset, frame, added_bytes=None):
+        with self._lock:
+            dataset.frame = frame
+            if added_bytes is not None and dataset.name in self._resident:
+                dataset.nbytes += added_bytes # cheaper than measuring the whole frame again for every appended row
+            else:
+                dataset.nbytes = int(frame.memory_usage(deep=True).sum())
+            self._resident[dataset.name] = dataset
+            self._resident.move_to_end(dataset.name)
+
+            total = sum(resident.nbytes for resident in self._resident.values())
+            while total > self.budget_bytes and len(self._resident) > 1:
+                _, evicted = self._resident.popitem(last=False)
+                evicted.frame = None
+                total -= evicted.nbytes
+                print(f"Evicted dataset {evicted.name!r} ({evicted.nbytes} bytes) from memory")
+
+    def _committed(self, dataset, committed, logged):
+        # Runs on the append log's writer thread. No dataset.lock here: flush() waits for this thread while holding it
+        error = logged.exception()
+        if error is None:
+            committed.set_result(None)
+            return
+        dataset.dirty = True     # before the caller hears about it, so its next read does not see the row
+        dataset.generation += 1
+        committed.set_exception(error)
+
+    def _fsync_policy(self):
+        return self.log_options.get("fsync", "always")
+
+    def _close_log(self, dataset):
+        if dataset.log is not None:
+            dataset.log.close() # commits and compacts anything still pending
+            dataset.log = None
+
+
+def temp_path(path):
+    """A new, uniquely named file next to `path`. Two workspaces (or processes) writing the same dataset never share one."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    os.close(fd)
+    return tmp_path
+
+
+def replace_durably(tmp_path, path):
+    mode = os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644 # mkstemp files are owner-only
+    os.chmod(tmp_path, mode)
+    with open(tmp_path, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_dir(path)